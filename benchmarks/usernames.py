@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Compare username normalization with the original implementation
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/usernames.py [number_of_names]
+
+Names are drawn both from short lists, as on real rounds where names
+repeat a lot, and randomly generated, so that nearly every name is
+distinct and the result cache doesn't help.
+The original functions are copied here, since the library no longer
+contains them.
+"""
+
+import re
+import sys
+from random import Random
+from timeit import default_timer
+
+from unicodedata import combining, normalize
+
+from candidates.utils import users
+
+FIRST_NAMES = [u'Maria', u'Märta', u'Aino', u'Erkki', u'Jüri', u'Åsa',
+               u'Liisa', u'Jérôme', u'Søren', u'Zoë', u'Łukasz', u'Anna']
+LAST_NAMES = [u'Virtanen', u'Järvinen', u"O'Malley-Korhonen", u'Nieminen',
+              u'Mäkinen', u'Sepällä', u'Dvořák', u'Müller', u'Žukauskas',
+              u'Nummelan-Pusulan-Ärjävöisen-Seppälä']
+LETTERS = u'abcdefghijklmnopqrstuvwxyzäöåéüšž'
+
+
+def legacy_noncombining(u):
+    return not combining(u)
+
+def legacy_remove_diacritics(s, encoding='UTF-8'):
+    if isinstance(s, unicode):
+        return filter(legacy_noncombining, normalize('NFKD', s))
+    else:
+        return filter(legacy_noncombining,
+                      normalize('NFKD', s.decode(encoding))).encode(encoding)
+
+def legacy_usernameize(s):
+    return re.sub(r'\W', '', legacy_remove_diacritics(s.lower()))
+
+def legacy_generate_username(first_name, last_name, round_name, n=None):
+    if n is None:
+        suffix = ''
+    else:
+        suffix = '_%d' % n
+    max_name_len = 30 - len(round_name) - len(suffix)
+    name = ('%s%s' % (legacy_usernameize(first_name),
+                      legacy_usernameize(last_name)))[:max_name_len]
+    return '%s%s%s' % (name, round_name, suffix)
+
+
+def make_names(count, seed=2010):
+    random = Random(seed)
+    return [(random.choice(FIRST_NAMES), random.choice(LAST_NAMES))
+            for i in xrange(count)]
+
+def make_distinct_names(count, seed=2010):
+    random = Random(seed)
+    def make_name():
+        return u''.join(random.choice(LETTERS)
+                        for i in xrange(random.randint(4, 12))).title()
+    return [(make_name(), make_name()) for i in xrange(count)]
+
+
+def measure(func):
+    started = default_timer()
+    result = func()
+    return default_timer() - started, result
+
+
+def compare(label, names, round_name='2010'):
+    users.usernameize.cache.clear()
+    legacy_time, legacy = measure(lambda: [
+            legacy_generate_username(first, last, round_name)
+            for first, last in names])
+    new_time, new = measure(
+        lambda: users.generate_usernames(names, round_name))
+    assert legacy == new
+    all_names = [first for first, last in names]
+    legacy_diacritics_time, legacy_stripped = measure(
+        lambda: [legacy_remove_diacritics(name) for name in all_names])
+    new_diacritics_time, new_stripped = measure(
+        lambda: [users.remove_diacritics(name) for name in all_names])
+    assert legacy_stripped == new_stripped
+
+    for function, legacy_seconds, new_seconds in [
+        ('remove_diacritics', legacy_diacritics_time, new_diacritics_time),
+        ('usernames', legacy_time, new_time)]:
+        sys.stdout.write('%-9s %-18s %8d names  legacy %7.3f s  '
+                         'new %7.3f s  %5.1fx\n' % (
+                label, function, len(names), legacy_seconds, new_seconds,
+                legacy_seconds / new_seconds))
+
+
+def main(count=100000):
+    compare('repeating', make_names(count))
+    compare('distinct', make_distinct_names(count))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,121 @@
+"""Admission control for expensive requests
+
+:class:`AdmissionController` limits the number of requests processed
+concurrently.  Within a process, requests wait for a free slot for at
+most a configured time.  Optionally, a counter in the cache backend
+limits the total across all processes sharing the cache.  A request
+which doesn't get a slot is rejected, so the view can ask the user to
+retry instead of piling up on database locks and the mail server.
+
+The number of waiting and active requests and the numbers of admitted
+and rejected requests are reported as ``admission.<name>.*`` metrics
+through :mod:`candidates.instrumentation`.  The gauges are reported
+whenever they change, in either direction.
+"""
+
+import threading
+from time import time as clock
+
+from django.core.cache import cache
+
+from candidates.instrumentation import gauge, increment
+
+
+class AdmissionController(object):
+    """Limit concurrent requests per process and across processes
+
+    ``max_active`` requests may run at once in a process.  Others wait
+    up to ``timeout`` seconds for a slot.  If ``shared_limit`` is given,
+    at most that many requests may run at once in all processes sharing
+    the cache.  The shared counter expires after ``cache_timeout``
+    seconds, so slots leaked by killed processes are eventually freed.
+    """
+    def __init__(self, name, max_active, timeout=2.0, shared_limit=None,
+                 cache_timeout=300):
+        self.name = name
+        self.max_active = max_active
+        self.timeout = timeout
+        self.shared_limit = shared_limit
+        self.cache_timeout = cache_timeout
+        self.cache_key = 'candidates.admission.%s' % name
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def metric(self, name):
+        return 'admission.%s.%s' % (self.name, name)
+
+    def acquire(self):
+        """Wait for a slot, return ``False`` if none became free in time"""
+        if not self.acquire_local():
+            self.reject()
+            return False
+        if self.shared_limit and not self.acquire_shared():
+            self.release_local()
+            self.reject()
+            return False
+        self.admitted += 1
+        increment(self.metric('admitted'))
+        return True
+
+    def release(self):
+        if self.shared_limit:
+            self.release_shared()
+        self.release_local()
+
+    def reject(self):
+        self.rejected += 1
+        increment(self.metric('rejected'))
+
+    def acquire_local(self):
+        deadline = clock() + self.timeout
+        self.condition.acquire()
+        try:
+            self.waiting += 1
+            gauge(self.metric('waiting'), self.waiting)
+            try:
+                while self.active >= self.max_active:
+                    remaining = deadline - clock()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+                gauge(self.metric('waiting'), self.waiting)
+            self.active += 1
+            gauge(self.metric('active'), self.active)
+            return True
+        finally:
+            self.condition.release()
+
+    def release_local(self):
+        self.condition.acquire()
+        try:
+            self.active -= 1
+            gauge(self.metric('active'), self.active)
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def acquire_shared(self):
+        cache.add(self.cache_key, 0, self.cache_timeout)
+        try:
+            count = cache.incr(self.cache_key)
+        except ValueError:
+            # The counter expired between add() and incr()
+            cache.set(self.cache_key, 1, self.cache_timeout)
+            count = 1
+        gauge(self.metric('shared_active'), count)
+        if count > self.shared_limit:
+            self.release_shared()
+            return False
+        return True
+
+    def release_shared(self):
+        try:
+            count = cache.decr(self.cache_key)
+        except ValueError:
+            return
+        gauge(self.metric('shared_active'), count)
@@ -0,0 +1,105 @@
+"""Streaming export of the applications of a round
+
+The generators in this module produce CSV or JSON Lines output one row
+at a time, loading applications in chunks, so that the memory used by
+an export doesn't grow with the size of the round.
+"""
+
+import csv
+from datetime import date, datetime, time
+from decimal import Decimal
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from django.db.models.fields.files import FieldFile
+
+from candidates.utils.queries import iterate_in_chunks
+
+USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-json-lines; charset=utf-8',
+    }
+
+
+def export_columns(model, user_fields=USER_FIELDS):
+    """Return the column names of an export of ``model``
+
+    The concrete fields of the application model are included, except
+    for those named in its ``export_exclude`` attribute, followed by the
+    given fields of the user as ``user__<field>``.
+    """
+    exclude = set(getattr(model, 'export_exclude', ())) | set(['user'])
+    columns = [field.attname for field in model._meta.fields
+               if field.name not in exclude]
+    return columns + ['user__%s' % field for field in user_fields]
+
+
+def export_queryset(model, round_name=None):
+    queryset = model._default_manager.select_related('user')
+    if round_name is not None:
+        queryset = queryset.filter(round_name=round_name)
+    return queryset
+
+
+def _convert(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, FieldFile):
+        return value.name
+    return value
+
+
+def export_rows(queryset, columns, chunk_size=1000):
+    """Yield the values of ``columns`` for each application as a list"""
+    for application in iterate_in_chunks(queryset, chunk_size):
+        row = []
+        for column in columns:
+            if column.startswith('user__'):
+                value = getattr(application.user, column[len('user__'):])
+            else:
+                value = getattr(application, column)
+            row.append(_convert(value))
+        yield row
+
+
+class _Echo(object):
+    """File-like object which returns what is written to it"""
+    def write(self, value):
+        return value
+
+
+def _encode(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('UTF-8')
+    return value
+
+
+def csv_lines(rows, columns):
+    """Yield a CSV header and UTF-8 encoded CSV lines for ``rows``"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_encode(value) for value in row])
+
+
+def jsonl_lines(rows, columns):
+    """Yield a JSON object on a line of its own for each row"""
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row))) + '\n'
+
+
+def export_lines(queryset, columns, format='csv', chunk_size=1000):
+    rows = export_rows(queryset, columns, chunk_size)
+    if format == 'csv':
+        return csv_lines(rows, columns)
+    if format == 'jsonl':
+        return jsonl_lines(rows, columns)
+    raise ValueError('Unknown export format: %r' % format)
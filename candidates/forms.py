@@ -1,35 +1,176 @@
 from django import forms
+from django.forms.models import BaseInlineFormSet, inlineformset_factory
 from django.utils.translation import ugettext_lazy as _, ugettext
 from django.contrib.auth.models import User
+from django.utils.datastructures import SortedDict, MultiValueDict
 
+from candidates.uploads import file_hash
 from candidates.widgets import ViewTextarea
+from candidates.utils.users import applicant_key
+
+def _strip(value):
+    if isinstance(value, basestring):
+        return value.strip()
+    return value
+
+class StrippedDict(dict):
+    """Form data in a plain dictionary, stripped by :func:`strip_data`"""
+
+class StrippedMultiValueDict(MultiValueDict):
+    """Form data in a multi-value dictionary, stripped by :func:`strip_data`"""
+
+def strip_data(data, prefix=None):
+    """
+    Return a shallow copy of the values of the form with the given
+    ``prefix`` (or of all values if ``prefix`` is ``None``) in form
+    ``data``, with leading and trailing whitespace stripped from
+    strings.  The copy remembers which prefixes have been stripped.
+    """
+    def matches(key):
+        return prefix is None or key.startswith(prefix + '-')
+    if hasattr(data, 'lists'):
+        stripped = StrippedMultiValueDict(dict(
+                (key, [_strip(value) for value in values])
+                for key, values in data.lists() if matches(key)))
+    else:
+        stripped = StrippedDict(
+            (key, _strip(value))
+            for key, value in data.items() if matches(key))
+    stripped.stripped_prefixes = (
+        getattr(data, 'stripped_prefixes', ()) + (prefix,))
+    return stripped
+
+def is_stripped(data, prefix=None):
+    """Check whether :func:`strip_data` has covered the given prefix"""
+    for stripped_prefix in getattr(data, 'stripped_prefixes', ()):
+        if stripped_prefix is None:
+            return True
+        if prefix is not None and (
+            prefix == stripped_prefix or
+            prefix.startswith(stripped_prefix + '-')):
+            return True
+    return False
+
+def _strip_form_data(form):
+    """Replace the data of a bound form with a stripped copy"""
+    if form.is_bound and not is_stripped(form.data, form.prefix):
+        form.data = strip_data(form.data, form.prefix)
+
+class StripWhitespaceMixin(object):
+    """
+    Form mixin which strips leading and trailing whitespace from the
+    submitted values of the form in a single pass before the fields are
+    cleaned.  Field objects aren't modified.  If the data has already
+    been stripped, e.g. by a formset using
+    :class:`StripWhitespaceFormSetMixin`, it is used as is.
+    """
+    def __init__(self, *args, **kwargs):
+        super(StripWhitespaceMixin, self).__init__(*args, **kwargs)
+        _strip_form_data(self)
+
+class StripWhitespaceFormSetMixin(object):
+    """
+    Formset mixin which strips whitespace from all submitted values once
+    for the forms of the formset.
+    """
+    def __init__(self, data=None, *args, **kwargs):
+        if data is not None and not is_stripped(data):
+            data = strip_data(data)
+        super(StripWhitespaceFormSetMixin, self).__init__(
+            data, *args, **kwargs)
 
 def autostrip(cls):
     """
     Decorate form class to strip leading/trailing whitespace
 
-    From http://www.djangosnippets.org/snippets/956/
+    Originally from http://www.djangosnippets.org/snippets/956/
 
-    Here is a class decorator that allows not to bother with stripping leading
-    and trailing white space from user input provided via forms. This could be
-    a temporary solution for an issue addressed in the ticket #6362.
+    The ``__init__`` method of the class is wrapped to strip the
+    submitted data like :class:`StripWhitespaceMixin` does, and the
+    class itself is returned, so ``Form = autostrip(Form)`` keeps
+    working with ``super(Form, self)`` calls in the class.  New code
+    should inherit from the mixin instead.
     """
-    fields = [(key, value) for key, value in cls.base_fields.iteritems()
-              if isinstance(value, forms.CharField)]
-    for field_name, field_object in fields:
-        def get_clean_func(original_clean):
-            return lambda value: original_clean(value and value.strip())
-        clean_func = get_clean_func(getattr(field_object, 'clean'))
-        setattr(field_object, 'clean', clean_func)
+    original_init = cls.__init__
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        _strip_form_data(self)
+    cls.__init__ = __init__
     return cls
 
-def user_exists(email, last_name, first_name, current_round_name):
-    # @@@ TODO: applications relation still hard coded here
+class LazyForm(object):
+    """
+    Proxy for a form (or a formset or a list of forms) which is created
+    only when it is first used, e.g. when a template renders it.
+    """
+    def __init__(self, factory, key):
+        self._factory = factory
+        self._key = key
+
+    def _get_form(self):
+        return self._factory()[self._key]
+
+    @property
+    def __class__(self):
+        return self._get_form().__class__
+
+    def __getattr__(self, name):
+        return getattr(self._get_form(), name)
+
+    def __getitem__(self, key):
+        return self._get_form()[key]
+
+    def __iter__(self):
+        return iter(self._get_form())
+
+    def __len__(self):
+        return len(self._get_form())
+
+    def __nonzero__(self):
+        return bool(self._get_form())
+    __bool__ = __nonzero__
+
+    def __unicode__(self):
+        return unicode(self._get_form())
+
+    def __str__(self):
+        return str(self._get_form())
+
+    def __repr__(self):
+        return '<LazyForm %r>' % self._key
+
+def lazy_forms(create_forms, keys):
+    """
+    Return a ``SortedDict`` of :class:`LazyForm` proxies for ``keys``.
+    The ``create_forms`` callable must return a dictionary of forms.  It
+    is called at most once, when any of the proxies is first used.
+    """
+    created = []
+    def factory():
+        if not created:
+            created.append(create_forms())
+        return created[0]
+    return SortedDict((key, LazyForm(factory, key)) for key in keys)
+
+def user_exists(email, last_name, first_name, current_round_name,
+                application_model=None):
+    """
+    Check whether an applicant with the given name and e-mail address
+    has already applied on the round.
+
+    With ``application_model``, the indexed ``applicant_key`` column of
+    the application model is used.  Otherwise the ``applications``
+    relation of users is searched case-insensitively.
+    """
+    if application_model is not None:
+        return application_model._default_manager.filter(
+            applicant_key=applicant_key(
+                first_name, last_name, email, current_round_name)).exists()
     return User.objects.filter(
         first_name__iexact=first_name,
         last_name__iexact=last_name,
         email__iexact=email,
-        applications__round_name__exact=current_round_name).count()
+        applications__round_name__exact=current_round_name).exists()
 
 class BaseUserForm(forms.ModelForm):
     class Meta:
@@ -42,23 +183,29 @@ class ViewUserForm(BaseUserForm):
         for f in self.fields.values():
             f.widget = ViewTextarea()
 
-class UserForm(BaseUserForm):
+class UserForm(StripWhitespaceMixin, BaseUserForm):
     last_name = forms.CharField(required=True, label=_('last name'))
     first_name = forms.CharField(required=True, label=_('first name'))
     email = forms.EmailField(required=True, label=_('e-mail address'))
 
-    def __init__(self, current_round_name=None, **kwargs):
+    def __init__(self, current_round_name=None, application_model=None,
+                 check_duplicates=True, **kwargs):
         """Create a user details model form
 
         UserForm needs to receive the :func:`get_current_round_name`
         function as an argument to be able to validate that the user
-        details don't already exist for the current round.
+        details don't already exist for the current round.  If the
+        application model is given, its ``applicant_key`` index is used
+        for the check.  Callers which check for duplicates in bulk can
+        disable the check with ``check_duplicates=False``.
         """
         super(UserForm, self).__init__(**kwargs)
         if current_round_name is None:
             raise ValueError('The current round name must be passed '
                              'to UserForm() as an argument')
         self.current_round_name = current_round_name
+        self.application_model = application_model
+        self.check_duplicates = check_duplicates
 
     def clean(self):
         """Validate that candidate doesn't already exist
@@ -68,13 +215,65 @@ class UserForm(BaseUserForm):
         registered on this round.
         """
         c = super(UserForm, self).clean()
-        if (self.instance.pk is None and
+        if (self.check_duplicates and
+            self.instance.pk is None and
             c.get('email') and
             user_exists(c.get('email'),
                         c.get('last_name'),
                         c.get('first_name'),
-                        self.current_round_name)):
+                        self.current_round_name,
+                        self.application_model)):
             raise forms.ValidationError(
                 ugettext('APPLICATION_EXISTS PLEASE_LOGIN'))
         return c
-UserForm = autostrip(UserForm)
+
+class AttachmentForm(forms.ModelForm):
+    """
+    Form for a single attachment of an application.  Uploads rejected by
+    :class:`candidates.uploads.AttachmentUploadHandler` are reported as
+    errors of the file field.  Use :func:`attachment_formset_factory` to
+    create formsets of attachments.
+    """
+    def __init__(self, *args, **kwargs):
+        super(AttachmentForm, self).__init__(*args, **kwargs)
+        self.rejection = getattr(self.files, 'rejected', {}).get(
+            self.add_prefix('file'))
+
+    def has_changed(self):
+        return (bool(self.rejection) or
+                super(AttachmentForm, self).has_changed())
+
+    def clean(self):
+        if self.rejection:
+            self._errors['file'] = self.error_class([self.rejection])
+            self.cleaned_data.pop('file', None)
+        return self.cleaned_data
+
+    class Meta:
+        fields = 'file',
+
+class BaseAttachmentFormSet(BaseInlineFormSet):
+    """
+    Inline formset of attachments which doesn't add a file again if the
+    application already has an attachment with identical content.
+    """
+    def save_new(self, form, commit=True):
+        upload = form.cleaned_data.get('file')
+        if upload is not None:
+            duplicates = self.model._default_manager.filter(**{
+                    self.fk.name: self.instance,
+                    'content_hash': file_hash(upload)})
+            for attachment in duplicates[:1]:
+                return attachment
+        return super(BaseAttachmentFormSet, self).save_new(form, commit)
+
+def attachment_formset_factory(application_model, attachment_model,
+                               form=AttachmentForm, extra=1, **kwargs):
+    """
+    Return an inline formset class for the attachments of an
+    application, to be created in
+    :meth:`~candidates.views.EditApplicationBase.create_extra_forms`.
+    """
+    return inlineformset_factory(application_model, attachment_model,
+                                 form=form, formset=BaseAttachmentFormSet,
+                                 extra=extra, **kwargs)
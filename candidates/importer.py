@@ -0,0 +1,176 @@
+"""Bulk import of applications from CSV or JSON Lines files
+
+The columns of the input are the field names of the project's
+application form and the user fields prefixed with ``user__``, like in
+the output of :mod:`candidates.export`.  Rows are validated with the
+application form and :class:`~candidates.forms.UserForm`, and valid rows
+are inserted in chunks.
+"""
+
+import csv
+from datetime import datetime
+from operator import or_
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from django.contrib.auth.models import User
+
+from candidates.forms import UserForm
+from candidates.utils.users import applicant_key, username_prefix, \
+    generate_usernames
+
+USER_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def read_csv(lines, encoding='UTF-8'):
+    for row in csv.DictReader(lines):
+        yield dict((key, value.decode(encoding))
+                   for key, value in row.items() if value is not None)
+
+
+def read_jsonl(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def bulk_insert(model, objects):
+    """Insert objects with ``bulk_create`` if this Django version has it"""
+    manager = model._default_manager
+    if hasattr(manager, 'bulk_create'):
+        manager.bulk_create(objects)
+    else:
+        for obj in objects:
+            obj.save(force_insert=True)
+
+
+class ApplicationImporter(object):
+    """Validate and insert applications in chunks
+
+    Imported users get an unusable password.  Unless
+    ``send_confirmation_email`` is ``False``, the applications are left
+    waiting for a confirmation e-mail, which can be sent with the
+    ``resend_confirmation_emails`` management command.
+    """
+    def __init__(self, model, form_class, round_name, chunk_size=500,
+                 send_confirmation_email=True):
+        self.model = model
+        self.form_class = form_class
+        self.round_name = round_name
+        self.chunk_size = chunk_size
+        self.send_confirmation_email = send_confirmation_email
+        self.seen_keys = set()
+        self.taken_usernames = set()
+
+    def import_rows(self, rows):
+        """Import rows, return the count of imported rows and the rejects
+
+        Rejects are ``(line_number, row, errors)`` tuples.
+        """
+        imported = 0
+        rejects = []
+        chunk = []
+        for line_number, row in enumerate(rows, 1):
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                imported += self.import_chunk(chunk, rejects)
+                chunk = []
+        if chunk:
+            imported += self.import_chunk(chunk, rejects)
+        return imported, rejects
+
+    def validate(self, line_number, row, rejects):
+        user_data = dict((column, row.get('user__%s' % column, ''))
+                         for column in USER_COLUMNS)
+        user_form = UserForm(data=user_data,
+                             current_round_name=self.round_name,
+                             check_duplicates=False)
+        application_form = self.form_class(data=row)
+        if not user_form.is_valid() or not application_form.is_valid():
+            errors = dict(('user__%s' % key, value)
+                          for key, value in user_form.errors.items())
+            errors.update(application_form.errors)
+            rejects.append((line_number, row, errors))
+            return None
+        return user_form, application_form
+
+    def import_chunk(self, chunk, rejects):
+        valid = []
+        for line_number, row in chunk:
+            forms = self.validate(line_number, row, rejects)
+            if forms is None:
+                continue
+            user = forms[0].save(commit=False)
+            key = applicant_key(user.first_name, user.last_name, user.email,
+                                self.round_name)
+            valid.append((line_number, row, key, user, forms[1]))
+
+        existing = set(self.model._default_manager.filter(
+                applicant_key__in=[item[2] for item in valid]).values_list(
+                'applicant_key', flat=True))
+        accepted = []
+        for line_number, row, key, user, application_form in valid:
+            if key in existing or key in self.seen_keys:
+                rejects.append((line_number, row,
+                                {'__all__': ['Duplicate application']}))
+                continue
+            self.seen_keys.add(key)
+            accepted.append((line_number, row, user, application_form))
+        if not accepted:
+            return 0
+
+        try:
+            self.insert(accepted)
+        except IntegrityError as e:
+            for line_number, row, user, application_form in accepted:
+                rejects.append((line_number, row, {'__all__': [str(e)]}))
+            return 0
+        return len(accepted)
+
+    @transaction.commit_on_success
+    def insert(self, accepted):
+        users = [item[2] for item in accepted]
+        self.allocate_usernames(users)
+        now = datetime.now()
+        for user in users:
+            user.is_active = True
+            user.date_joined = user.last_login = now
+            user.set_unusable_password()
+        bulk_insert(User, users)
+        user_pks = dict(User.objects.filter(
+                username__in=[user.username for user in users]).values_list(
+                'username', 'pk'))
+
+        applications = []
+        for line_number, row, user, application_form in accepted:
+            user.pk = user_pks[user.username]
+            application = application_form.save(commit=False)
+            application.user = user
+            application.round_name = self.round_name
+            application.send_confirmation_email = self.send_confirmation_email
+            application.confirmed = False
+            application.prepare_save()
+            applications.append(application)
+        bulk_insert(self.model, applications)
+
+    def allocate_usernames(self, users):
+        """Allocate unique usernames for new users with a single query"""
+        prefixes = set(username_prefix(user.first_name, user.last_name,
+                                       self.round_name)
+                       for user in users)
+        query = reduce(or_, [Q(username__startswith=prefix)
+                             for prefix in prefixes])
+        self.taken_usernames.update(
+            User.objects.filter(query).values_list('username', flat=True))
+        usernames = generate_usernames(
+            [(user.first_name, user.last_name) for user in users],
+            self.round_name, self.taken_usernames)
+        for user, username in zip(users, usernames):
+            user.username = username
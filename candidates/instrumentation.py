@@ -0,0 +1,191 @@
+"""Opt-in timing and query count instrumentation of the views
+
+Instrumentation is enabled with the ``CANDIDATES_INSTRUMENTATION``
+setting.  Each instrumented request produces a :class:`Profile` with the
+duration and the number of database queries of each phase (permission
+check, deadline, form creation, validation, saving and e-mail).  The
+profile is handed to the sink named by the dotted path in the
+``CANDIDATES_INSTRUMENTATION_SINK`` setting:
+
+* :class:`LoggingSink` (the default) logs a line per request
+* :class:`StatsdSink` sends timers over UDP to a statsd daemon at
+  ``CANDIDATES_STATSD_ADDRESS`` (default ``('127.0.0.1', 8125)``)
+* :class:`MemorySink` keeps the profiles in memory, e.g. for tests
+
+Besides profiles, sinks receive counters and gauges, e.g. the
+admission control metrics of :mod:`candidates.admission`, through
+:func:`increment` and :func:`gauge`.
+
+When instrumentation is disabled, :func:`instrumented` and :func:`timed`
+just call the wrapped functions, and metrics are dropped.
+"""
+
+import logging
+import socket
+import threading
+from functools import wraps
+from time import time as clock
+
+from django.conf import settings
+from django.db import connection
+from django.utils.datastructures import SortedDict
+from django.utils.importlib import import_module
+
+DEFAULT_SINK = 'candidates.instrumentation.LoggingSink'
+
+_local = threading.local()
+_sinks = {}
+
+
+def is_enabled():
+    return getattr(settings, 'CANDIDATES_INSTRUMENTATION', False)
+
+
+class Profile(object):
+    """Durations and query counts of the phases of a single request"""
+    def __init__(self, name):
+        self.name = name
+        self.durations = SortedDict()
+        self.queries = SortedDict()
+        self.duration = None
+        self.query_count = None
+        self.started = clock()
+        self.first_query = len(connection.queries)
+
+    def add(self, phase, duration, queries):
+        self.durations[phase] = self.durations.get(phase, 0) + duration
+        self.queries[phase] = self.queries.get(phase, 0) + queries
+
+    def finish(self):
+        self.duration = clock() - self.started
+        self.query_count = len(connection.queries) - self.first_query
+
+
+class LoggingSink(object):
+    logger = logging.getLogger('candidates.instrumentation')
+
+    def emit(self, profile):
+        self.logger.info('%s %.1f ms, %d queries: %s', profile.name,
+                         1000 * profile.duration, profile.query_count,
+                         ', '.join('%s %.1f ms/%d q' % (
+                        phase, 1000 * duration, profile.queries[phase])
+                                   for phase, duration
+                                   in profile.durations.items()))
+
+    def increment(self, name, value=1):
+        self.logger.info('%s +%d', name, value)
+
+    def gauge(self, name, value):
+        self.logger.info('%s = %d', name, value)
+
+
+class StatsdSink(object):
+    """Send the timings and query counts to statsd in a single packet"""
+    def __init__(self):
+        self.address = getattr(settings, 'CANDIDATES_STATSD_ADDRESS',
+                               ('127.0.0.1', 8125))
+        self.prefix = getattr(settings, 'CANDIDATES_STATSD_PREFIX',
+                              'candidates')
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, profile):
+        name = '%s.%s' % (self.prefix, profile.name)
+        lines = ['%s:%d|ms' % (name, 1000 * profile.duration),
+                 '%s.queries:%d|ms' % (name, profile.query_count)]
+        for phase, duration in profile.durations.items():
+            lines.append('%s.%s:%d|ms' % (name, phase, 1000 * duration))
+            lines.append('%s.%s.queries:%d|ms' % (
+                    name, phase, profile.queries[phase]))
+        self.send('\n'.join(lines))
+
+    def increment(self, name, value=1):
+        self.send('%s.%s:%d|c' % (self.prefix, name, value))
+
+    def gauge(self, name, value):
+        self.send('%s.%s:%d|g' % (self.prefix, name, value))
+
+    def send(self, packet):
+        try:
+            self.socket.sendto(packet, self.address)
+        except socket.error as e:
+            logging.debug('Sending metrics to statsd failed: %s', e)
+
+
+class MemorySink(object):
+    def __init__(self):
+        self.profiles = []
+        self.counters = {}
+        self.gauges = {}
+
+    def emit(self, profile):
+        self.profiles.append(profile)
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+
+def get_sink():
+    """Return the sink configured in settings, one instance per path"""
+    path = getattr(settings, 'CANDIDATES_INSTRUMENTATION_SINK', DEFAULT_SINK)
+    if path not in _sinks:
+        module_name, name = path.rsplit('.', 1)
+        _sinks[path] = getattr(import_module(module_name), name)()
+    return _sinks[path]
+
+
+def instrumented(name):
+    """Decorator which profiles a view method as a request named ``name``
+
+    Nested instrumented calls are included in the outermost profile.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled() or getattr(_local, 'profile', None):
+                return func(*args, **kwargs)
+            use_debug_cursor = getattr(connection, 'use_debug_cursor', None)
+            connection.use_debug_cursor = True
+            profile = _local.profile = Profile(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.finish()
+                _local.profile = None
+                connection.use_debug_cursor = use_debug_cursor
+                try:
+                    get_sink().emit(profile)
+                except Exception as e:
+                    logging.warning('Emitting the profile of %s failed: %s',
+                                    name, e)
+        return wrapper
+    return decorator
+
+
+def timed(phase, func, *args, **kwargs):
+    """Call ``func`` and add its duration to ``phase`` of the current
+    profile, if any"""
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return func(*args, **kwargs)
+    started = clock()
+    first_query = len(connection.queries)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.add(phase, clock() - started,
+                    len(connection.queries) - first_query)
+
+
+def increment(name, value=1):
+    """Add ``value`` to the counter ``name`` in the sink"""
+    if is_enabled():
+        get_sink().increment(name, value)
+
+
+def gauge(name, value):
+    """Report the current value of the gauge ``name`` to the sink"""
+    if is_enabled():
+        get_sink().gauge(name, value)
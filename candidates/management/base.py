@@ -0,0 +1,29 @@
+from django.core.management.base import CommandError
+from django.db.models import get_model
+from django.utils.importlib import import_module
+
+from candidates.models import ApplicationBase
+
+
+def get_application_model(label):
+    """Return the concrete application model for an app_label.Model label"""
+    try:
+        app_label, model_name = label.split('.')
+    except ValueError:
+        raise CommandError('Give the application model as app_label.Model, '
+                           'not %r' % label)
+    model = get_model(app_label, model_name)
+    if model is None:
+        raise CommandError('Unknown model: %s' % label)
+    if not issubclass(model, ApplicationBase):
+        raise CommandError('%s is not an application model' % label)
+    return model
+
+
+def import_object(path):
+    """Return the object named by a dotted path, e.g. a form class"""
+    try:
+        module_name, name = path.rsplit('.', 1)
+        return getattr(import_module(module_name), name)
+    except (ValueError, ImportError, AttributeError):
+        raise CommandError('Cannot import %s' % path)
@@ -0,0 +1,34 @@
+from optparse import make_option
+
+from django.core.management.base import LabelCommand
+
+from candidates.management.base import get_application_model
+from candidates.utils.queries import iterate_in_chunks
+
+
+class Command(LabelCommand):
+    help = ('Fill in the applicant_key column used for detecting duplicate '
+            'applications.')
+    args = '<app_label.Model app_label.Model ...>'
+    label = 'application model'
+    option_list = LabelCommand.option_list + (
+        make_option('--round', dest='round_name',
+                    help='Only update applications of this round'),
+        make_option('--chunk-size', type='int', default=1000,
+                    help='Number of applications to load per query'),
+        )
+
+    def handle_label(self, label, **options):
+        model = get_application_model(label)
+        queryset = model._default_manager.select_related('user')
+        if options['round_name']:
+            queryset = queryset.filter(round_name=options['round_name'])
+        updated = 0
+        for application in iterate_in_chunks(queryset, options['chunk_size']):
+            old_key = application.applicant_key
+            application.update_applicant_key()
+            if application.applicant_key != old_key:
+                model._default_manager.filter(pk=application.pk).update(
+                    applicant_key=application.applicant_key)
+                updated += 1
+        return 'Updated %d applicant keys of %s\n' % (updated, label)
@@ -0,0 +1,45 @@
+import sys
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from candidates.export import FORMATS, export_columns, export_lines, \
+    export_queryset
+from candidates.management.base import get_application_model
+
+
+class Command(BaseCommand):
+    help = 'Export the applications of a round as CSV or JSON Lines.'
+    args = '<app_label.Model>'
+    option_list = BaseCommand.option_list + (
+        make_option('--round', dest='round_name',
+                    help='Only export applications of this round'),
+        make_option('--format', default='csv',
+                    help='Output format: %s' % ', '.join(sorted(FORMATS))),
+        make_option('--output', '-o',
+                    help='Write to this file instead of standard output'),
+        make_option('--chunk-size', type='int', default=1000,
+                    help='Number of applications to load per query'),
+        )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the application model as the only '
+                               'argument')
+        model = get_application_model(args[0])
+        if options['format'] not in FORMATS:
+            raise CommandError('Unknown format: %s' % options['format'])
+        lines = export_lines(export_queryset(model, options['round_name']),
+                             export_columns(model),
+                             options['format'],
+                             options['chunk_size'])
+        if options['output']:
+            output = open(options['output'], 'wb')
+        else:
+            output = sys.stdout
+        try:
+            for line in lines:
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,84 @@
+import os
+import sys
+from optparse import make_option
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from candidates.importer import READERS, ApplicationImporter
+from candidates.management.base import get_application_model, \
+    import_object
+
+
+class Command(BaseCommand):
+    help = ('Import applications from a CSV or JSON Lines file.  Columns '
+            'are the fields of the application form and user__first_name, '
+            'user__last_name and user__email.')
+    args = '<app_label.Model> <file>'
+    option_list = BaseCommand.option_list + (
+        make_option('--form', dest='form_class',
+                    help='Dotted path of the application form class used '
+                         'for validating rows'),
+        make_option('--round', dest='round_name',
+                    help='Round of the imported applications'),
+        make_option('--format',
+                    help='Input format: %s (default: guessed from the file '
+                         'name extension)' % ', '.join(sorted(READERS))),
+        make_option('--rejects',
+                    help='Write rejected rows to this JSON Lines file'),
+        make_option('--chunk-size', type='int', default=500,
+                    help='Number of applications to insert per transaction'),
+        make_option('--no-confirmation-email', action='store_false',
+                    dest='send_confirmation_email', default=True,
+                    help="Don't mark the applications as waiting for a "
+                         "confirmation e-mail"),
+        )
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError('Give the application model and the input '
+                               'file as arguments')
+        model = get_application_model(args[0])
+        if not options['form_class']:
+            raise CommandError('The --form option is required')
+        if not options['round_name']:
+            raise CommandError('The --round option is required')
+        format = options['format'] or os.path.splitext(args[1])[1][1:]
+        if format not in READERS:
+            raise CommandError('Unknown format: %s' % format)
+
+        importer = ApplicationImporter(
+            model, import_object(options['form_class']),
+            options['round_name'], options['chunk_size'],
+            options['send_confirmation_email'])
+        input_file = open(args[1], 'rb')
+        try:
+            imported, rejects = importer.import_rows(
+                READERS[format](input_file))
+        finally:
+            input_file.close()
+
+        if options['rejects']:
+            output = open(options['rejects'], 'w')
+            try:
+                for line_number, row, errors in rejects:
+                    output.write(json.dumps({
+                                'line': line_number,
+                                'errors': dict((key, [unicode(e) for e in value])
+                                               for key, value in errors.items()),
+                                'row': row}) + '\n')
+            finally:
+                output.close()
+        elif rejects:
+            for line_number, row, errors in rejects:
+                message = u'Line %d rejected: %s\n' % (
+                    line_number,
+                    u'; '.join(u'%s: %s' % (key, u' '.join(
+                                unicode(e) for e in value))
+                               for key, value in errors.items()))
+                sys.stderr.write(message.encode('UTF-8'))
+        return 'Imported %d applications, rejected %d\n' % (imported,
+                                                           len(rejects))
@@ -0,0 +1,32 @@
+from optparse import make_option
+
+from django.core.management.base import LabelCommand
+
+from candidates.management.base import get_application_model
+from candidates.search import get_search_backend
+from candidates.utils.queries import iterate_in_chunks
+
+
+class Command(LabelCommand):
+    help = ('Fill in the search documents of applications and create the '
+            'full-text index of the configured search backend.')
+    args = '<app_label.Model app_label.Model ...>'
+    label = 'application model'
+    option_list = LabelCommand.option_list + (
+        make_option('--chunk-size', type='int', default=1000,
+                    help='Number of applications to load per query'),
+        )
+
+    def handle_label(self, label, **options):
+        model = get_application_model(label)
+        queryset = model._default_manager.select_related('user')
+        updated = 0
+        for application in iterate_in_chunks(queryset, options['chunk_size']):
+            old_document = application.search_document
+            application.update_search_document()
+            if application.search_document != old_document:
+                model._default_manager.filter(pk=application.pk).update(
+                    search_document=application.search_document)
+                updated += 1
+        get_search_backend().install(model)
+        return 'Updated %d search documents of %s\n' % (updated, label)
@@ -0,0 +1,101 @@
+import logging
+from optparse import make_option
+from time import sleep, time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from candidates.management.base import import_object
+from candidates.outbox import discard_messages
+from candidates.utils.queries import queryset_chunks
+
+
+class Command(BaseCommand):
+    help = ('Send the confirmation e-mail to applications still waiting for '
+            'it.  A new password is generated for each applicant, since the '
+            'e-mail contains the password.')
+    args = '<path.to.EditApplicationView>'
+    option_list = BaseCommand.option_list + (
+        make_option('--round', dest='round_name',
+                    help='Round of the applications (default: the current '
+                         'round of the view)'),
+        make_option('--batch-size', type='int', default=100,
+                    help='Number of applications to load and update per '
+                         'batch'),
+        make_option('--rate', type='float', default=10.0,
+                    help='Maximum number of messages to send per second'),
+        )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the dotted path of the edit application '
+                               'view as the only argument')
+        view = import_object(args[0])
+        model = view.meta.model
+        round_name = options['round_name'] or view.meta.resolve_round_name()
+        queryset = model._default_manager.filter(
+            round_name=round_name,
+            send_confirmation_email=True,
+            confirmed=False).select_related('user')
+
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        sent = failed = 0
+        try:
+            for batch in queryset_chunks(queryset, options['batch_size']):
+                started = time()
+                batch_sent, batch_failed = self.send_batch(
+                    view, connection, batch)
+                sent += batch_sent
+                failed += batch_failed
+                delay = len(batch) / options['rate'] - (time() - started)
+                if delay > 0:
+                    sleep(delay)
+        finally:
+            connection.close()
+        return 'Sent %d confirmation e-mails, %d failures\n' % (sent, failed)
+
+    def send_batch(self, view, connection, applications):
+        """Send the e-mails of a batch through an open connection
+
+        The new password of each applicant is stored and the application
+        marked as sent before its message is handed to the mail server,
+        so a crash never leaves a mailed password unstored.  If sending
+        fails, the application is marked for sending again.
+        """
+        sent = 0
+        for application in applications:
+            password = view.generate_password()
+            application.user.set_password(password)
+            self.store_password(application)
+            message = EmailMessage(
+                view.confirmation_request_subject,
+                view.render_confirmation_email(None, application, password),
+                settings.APPLICATION_EMAIL_SENDER,
+                [application.user.email],
+                connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logging.warning('Sending the confirmation e-mail of %r '
+                                'failed: %s', application.pk, e)
+                type(application)._default_manager.filter(
+                    pk=application.pk).update(send_confirmation_email=True)
+                continue
+            sent += 1
+        return sent, len(applications) - sent
+
+    @transaction.commit_on_success
+    def store_password(self, application):
+        model = type(application)
+        User.objects.filter(pk=application.user_id).update(
+            password=application.user.password)
+        model._default_manager.filter(pk=application.pk).update(
+            send_confirmation_email=False)
+        # Queued messages contain passwords which are no longer valid.
+        discard_messages(ContentType.objects.get_for_model(model),
+                         [application.pk])
@@ -0,0 +1,52 @@
+import logging
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from candidates.outbox import dispatch
+
+
+class Command(NoArgsCommand):
+    help = 'Send e-mail messages queued in the candidates outbox.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', type='int', default=100,
+                    help='Number of messages to send per batch'),
+        make_option('--threads', type='int', default=4,
+                    help='Number of sending threads (SMTP connections)'),
+        make_option('--max-attempts', type='int', default=5,
+                    help='Give up on a message after this many attempts'),
+        make_option('--retry-delay', type='float', default=60.0,
+                    help='Seconds to wait before retrying a failed message; '
+                         'doubled after each further failure'),
+        make_option('--claim-timeout', type='float', default=600.0,
+                    help='Seconds after which messages claimed by a '
+                         'dispatcher which died may be sent by another'),
+        make_option('--loop', action='store_true', default=False,
+                    help='Keep polling the outbox instead of exiting when '
+                         'it is empty'),
+        make_option('--interval', type='float', default=5.0,
+                    help='Seconds to sleep between polls in --loop mode'),
+        )
+
+    def handle_noargs(self, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = dispatch(batch_size=options['batch_size'],
+                                    threads=options['threads'],
+                                    max_attempts=options['max_attempts'],
+                                    retry_delay=options['retry_delay'],
+                                    claim_timeout=options['claim_timeout'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                # Failed messages are deferred, so the next batch
+                # doesn't retry them right away.
+                logging.info('Outbox: sent %d, failed %d', sent, failed)
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('Sent %d messages, %d failures\n' %
+                              (total_sent, total_failed))
@@ -0,0 +1,25 @@
+from candidates.views import EditApplicationBase
+
+
+class DeadlineMiddleware(object):
+    """Reject anonymous POSTs to application forms after the deadline
+
+    The request is answered with the "deadline has passed" page of the
+    view before the view runs, so the submitted forms aren't parsed,
+    validated or saved.  Authenticated users fall through to the view,
+    since the secretary may still edit applications after the deadline.
+
+    Place this middleware before ``CsrfViewMiddleware``, which reads the
+    POST data, and after ``AuthenticationMiddleware``.
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method != 'POST':
+            return None
+        if not (isinstance(view_func, type) and
+                issubclass(view_func, EditApplicationBase)):
+            return None
+        if request.user.is_authenticated():
+            return None
+        if not view_func.is_past_deadline():
+            return None
+        return view_func.past_deadline_response(request)
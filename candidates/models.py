@@ -3,12 +3,27 @@ try:
 except ImportError:
     from sha import new as sha1
 from base64 import b32encode
+from mimetypes import guess_all_extensions, guess_extension
+from os import urandom
+from os.path import basename, splitext
 
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, Group
+from django.contrib.contenttypes import generic
+from django.contrib.contenttypes.models import ContentType
+from django.utils.crypto import salted_hmac, constant_time_compare
 from django.utils.translation import ugettext_lazy as _
 
+from candidates.roles import bump_permission_version
+from candidates.search import build_search_document
+from candidates.uploads import file_hash
+from candidates.utils.users import applicant_key
+
+def new_confirmation_salt():
+    return b32encode(urandom(10))
+
 class ApplicationBase(models.Model):
     user = models.ForeignKey(
         User,
@@ -17,6 +32,7 @@ class ApplicationBase(models.Model):
     round_name = models.CharField(
         _('round'),
         max_length=20,
+        db_index=True,
         editable=False,
         help_text=_('Indicate the round of applications, e.g. year'))
     send_confirmation_email = models.BooleanField(
@@ -30,11 +46,40 @@ class ApplicationBase(models.Model):
     date_created = models.DateTimeField(
         _('When created'),
         auto_now_add=True,
+        db_index=True,
         editable=False)
     date_updated = models.DateTimeField(
         _('Last update'),
         auto_now=True,
+        db_index=True,
+        editable=False)
+    applicant_key = models.CharField(
+        _('applicant key'),
+        max_length=255,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text=_('Normalized round, name and e-mail address used for '
+                    'detecting duplicate applications'))
+    confirmation_salt = models.CharField(
+        _('confirmation salt'),
+        max_length=16,
+        blank=True,
         editable=False)
+    search_document = models.TextField(
+        _('search document'),
+        blank=True,
+        editable=False,
+        help_text=_('Normalized name, e-mail address and search fields '
+                    'used for full-text search'))
+
+    # Names of the fields of the concrete model which are included in the
+    # search document in addition to the name and e-mail of the applicant
+    search_fields = ()
+
+    # Names of internal fields which are left out of exports.  The salt
+    # is the secret behind the confirmation codes.
+    export_exclude = ('applicant_key', 'confirmation_salt', 'search_document')
 
     def _get_confirmation_code(self):
         """
@@ -42,11 +87,75 @@ class ApplicationBase(models.Model):
         e-mail after the application is first saved.  The application can also
         be confirmed just by logging in with the username and password included
         in the e-mail.
+
+        The code is an HMAC of the primary key and the random confirmation
+        salt, so checking it doesn't require loading the user.  Applications
+        saved before the salt was introduced keep their old codes, which are
+        computed from the e-mail address of the user.  The code is cached on
+        the instance until the values it depends on change.
         """
-        plaintext = '%d%s%s' % (self.pk, self.user.email, settings.SECRET_KEY)
-        return b32encode(sha1(plaintext).digest())[:12]
+        if self.confirmation_salt:
+            key = (self.pk, self.confirmation_salt)
+        else:
+            key = (self.pk, self.user.email)
+        cached = getattr(self, '_confirmation_code_cache', None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if self.confirmation_salt:
+            digest = salted_hmac('candidates.confirmation_code',
+                                 '%d%s' % key).digest()
+        else:
+            plaintext = '%d%s%s' % (key + (settings.SECRET_KEY,))
+            digest = sha1(plaintext).digest()
+        code = b32encode(digest)[:12]
+        self._confirmation_code_cache = (key, code)
+        return code
     confirmation_code = property(_get_confirmation_code)
 
+    @classmethod
+    def mark_confirmed(cls, pk):
+        """Confirm the application with a single conditional UPDATE
+
+        Only the ``confirmed`` column is written.  Return ``True`` if the
+        application was unconfirmed before.
+        """
+        return bool(cls._default_manager.filter(
+                pk=pk, confirmed=False).update(confirmed=True))
+
+    def check_confirmation_code(self, code):
+        """Compare a code from a confirmation URL in constant time"""
+        return constant_time_compare(code, self.confirmation_code)
+
+    def update_applicant_key(self):
+        self.applicant_key = applicant_key(
+            self.user.first_name, self.user.last_name, self.user.email,
+            self.round_name)
+
+    def update_search_document(self):
+        values = [self.user.first_name, self.user.last_name, self.user.email]
+        values.extend(getattr(self, name) for name in self.search_fields)
+        self.search_document = build_search_document(values)
+
+    def prepare_save(self):
+        """Fill in the derived columns before saving
+
+        :meth:`save` calls this automatically.  Code which inserts
+        applications without calling :meth:`save` (e.g. with
+        ``bulk_create``) must call it for each application.
+
+        Only new applications get a confirmation salt.  Giving one to an
+        existing application would change its confirmation code and
+        break the link already mailed to the applicant.
+        """
+        self.update_applicant_key()
+        self.update_search_document()
+        if self.pk is None and not self.confirmation_salt:
+            self.confirmation_salt = new_confirmation_salt()
+
+    def save(self, *args, **kwargs):
+        self.prepare_save()
+        super(ApplicationBase, self).save(*args, **kwargs)
+
     def username(self):
         return u'%s, %s' % (self.user.last_name, self.user.first_name)
 
@@ -59,3 +168,143 @@ class ApplicationBase(models.Model):
         verbose_name_plural = _('applications')
         unique_together = ('user', 'round_name'),
         permissions = ('view_application', 'Can view application'),
+
+
+class QueuedEmail(models.Model):
+    """An e-mail message waiting to be sent by the outbox dispatcher
+
+    Messages are written in the same transaction as the application
+    they concern and sent later by the ``send_queued_email`` management
+    command.  When a message linked to an application has been sent,
+    the ``send_confirmation_email`` flag of the application is cleared.
+
+    A dispatcher claims the messages it is about to send by writing its
+    token in ``claimed_by``, so concurrent dispatchers don't send the
+    same message twice.
+    """
+    subject = models.CharField(_('subject'), max_length=255)
+    body = models.TextField(_('body'), blank=True)
+    from_email = models.CharField(_('sender'), max_length=255)
+    recipients = models.TextField(
+        _('recipients'),
+        help_text=_('One e-mail address per line'))
+    content_type = models.ForeignKey(ContentType, null=True, blank=True)
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    application = generic.GenericForeignKey('content_type', 'object_id')
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    last_error = models.TextField(_('last error'), blank=True)
+    next_attempt = models.DateTimeField(
+        _('Next attempt'),
+        null=True,
+        blank=True,
+        help_text=_('Failed messages are not retried before this time'))
+    claimed_by = models.CharField(_('claimed by'), max_length=32, blank=True)
+    claimed_at = models.DateTimeField(
+        _('When claimed'),
+        null=True,
+        blank=True)
+    date_created = models.DateTimeField(
+        _('When created'),
+        auto_now_add=True)
+    date_sent = models.DateTimeField(
+        _('When sent'),
+        null=True,
+        blank=True,
+        db_index=True)
+
+    def recipient_list(self):
+        return [r for r in self.recipients.splitlines() if r.strip()]
+
+    def __unicode__(self):
+        return u'%s: %s' % (', '.join(self.recipient_list()), self.subject)
+
+    class Meta:
+        verbose_name = _('queued e-mail')
+        verbose_name_plural = _('queued e-mails')
+        ordering = 'id',
+
+
+def attachment_upload_to(attachment, filename):
+    """Store attachments under their content hash
+
+    Identical files share the same name, so a file which has already
+    been stored isn't written again.  The extension of the uploaded file
+    is kept only if it belongs to the content type of the attachment
+    (which ``CANDIDATES_UPLOAD_CONTENT_TYPES`` restricts), so e.g. an
+    HTML file sent as ``application/pdf`` is stored as ``.pdf``.
+    """
+    extension = splitext(filename)[1].lower()
+    extensions = guess_all_extensions(attachment.content_type)
+    if extension not in extensions:
+        extension = guess_extension(attachment.content_type) or ''
+    return 'attachments/%s/%s%s' % (attachment.content_hash[:2],
+                                    attachment.content_hash, extension)
+
+class AttachmentBase(models.Model):
+    """A file attached to an application
+
+    Subclasses must define the ``application`` foreign key to the
+    project's application model.  The content hash, size, type and
+    original name are filled in from the uploaded file when the
+    attachment is saved.
+    """
+    file = models.FileField(
+        _('file'),
+        upload_to=attachment_upload_to,
+        max_length=255)
+    content_hash = models.CharField(
+        _('content hash'),
+        max_length=64,
+        db_index=True,
+        editable=False)
+    size = models.PositiveIntegerField(_('size'), editable=False)
+    content_type = models.CharField(
+        _('content type'),
+        max_length=100,
+        blank=True,
+        editable=False)
+    original_name = models.CharField(
+        _('original name'),
+        max_length=255,
+        editable=False)
+    date_created = models.DateTimeField(
+        _('When created'),
+        auto_now_add=True,
+        editable=False)
+
+    def prepare_file(self):
+        """Fill in the file metadata from a newly uploaded file
+
+        If a file with the same content has already been stored, it is
+        reused instead of storing the upload again.
+        """
+        upload = self.file.file
+        self.content_hash = file_hash(upload)
+        self.size = upload.size
+        self.content_type = getattr(upload, 'content_type', None) or ''
+        self.original_name = basename(upload.name)[-255:]
+        name = self.file.field.generate_filename(self, self.original_name)
+        if self.file.storage.exists(name):
+            self.file.name = name
+            self.file._committed = True
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.prepare_file()
+        super(AttachmentBase, self).save(*args, **kwargs)
+
+    def __unicode__(self):
+        return self.original_name
+
+    class Meta:
+        abstract = True
+        verbose_name = _('attachment')
+        verbose_name_plural = _('attachments')
+        ordering = 'id',
+
+
+for through in (User.user_permissions.through,
+                User.groups.through,
+                Group.permissions.through):
+    m2m_changed.connect(bump_permission_version, sender=through)
+post_delete.connect(bump_permission_version, sender=Group)
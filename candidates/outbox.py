@@ -0,0 +1,198 @@
+"""Durable outbox for e-mail sent by the application views
+
+Views call :func:`queue_email` inside the transaction which saves the
+application.  The :func:`dispatch` function, usually run by the
+``send_queued_email`` management command, drains the queue in batches.
+
+Each dispatcher first claims a batch with a conditional ``UPDATE``, so
+several dispatchers can run at once without sending a message twice.
+Claims of a dispatcher which died while sending expire after a timeout.
+Failed messages are retried with an exponentially growing delay.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from django.core.mail import EmailMessage, get_connection
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Q
+
+from candidates.models import QueuedEmail
+
+# Marks messages which are about to be deleted in ``claimed_by``
+SUPERSEDED = 'superseded'
+
+
+def queue_email(subject, body, from_email, recipient_list, application=None):
+    """Store an e-mail message in the outbox
+
+    If ``application`` is given, any unsent messages queued earlier for
+    the same application are discarded with :func:`discard_messages`:
+    they contain a password which is no longer valid.  The
+    ``send_confirmation_email`` flag of the application is cleared once
+    the message has been sent.
+    """
+    message = QueuedEmail(subject=subject,
+                          body=body,
+                          from_email=from_email,
+                          recipients='\n'.join(recipient_list))
+    if application is not None:
+        message.application = application
+        discard_messages(message.content_type, [message.object_id])
+    message.save()
+    return message
+
+
+def discard_messages(content_type, object_ids, claim_timeout=600):
+    """Discard the unsent messages of the given applications
+
+    Messages claimed by a running dispatcher are left alone, since they
+    may already be on their way.  The others are first marked as
+    superseded with a conditional ``UPDATE``, so no dispatcher can claim
+    them before they are deleted.
+    """
+    stale = datetime.now() - timedelta(seconds=claim_timeout)
+    QueuedEmail.objects.filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale),
+        content_type=content_type,
+        object_id__in=object_ids,
+        date_sent__isnull=True).update(
+        claimed_by=SUPERSEDED, claimed_at=None, body='')
+    QueuedEmail.objects.filter(claimed_by=SUPERSEDED).delete()
+
+
+def pending_messages(max_attempts, claim_timeout=600, now=None):
+    """Return the unsent messages which are due and not claimed
+
+    Claims older than ``claim_timeout`` seconds are ignored.
+    """
+    if now is None:
+        now = datetime.now()
+    stale = now - timedelta(seconds=claim_timeout)
+    return QueuedEmail.objects.filter(
+        Q(next_attempt__isnull=True) | Q(next_attempt__lte=now),
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale),
+        date_sent__isnull=True,
+        attempts__lt=max_attempts).exclude(claimed_by=SUPERSEDED)
+
+
+def claim_messages(batch_size, max_attempts, claim_timeout=600):
+    """Claim and return up to ``batch_size`` pending messages
+
+    The claiming ``UPDATE`` repeats the conditions of
+    :func:`pending_messages`, so a message claimed by another dispatcher
+    after it was selected here is left alone.
+    """
+    now = datetime.now()
+    token = uuid4().hex
+    pks = list(pending_messages(max_attempts, claim_timeout, now)
+               .values_list('pk', flat=True)[:batch_size])
+    if not pks:
+        return []
+    pending_messages(max_attempts, claim_timeout, now).filter(
+        pk__in=pks).update(claimed_by=token, claimed_at=now)
+    return list(QueuedEmail.objects.filter(claimed_by=token,
+                                           date_sent__isnull=True))
+
+
+def _send_chunk(messages, results):
+    """Send messages through one connection and record the outcome
+
+    Runs in a worker thread, so it must not touch the database.  Each
+    message is sent separately to find out which ones fail, but the
+    SMTP connection is reused for the whole chunk.
+    """
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for message in messages:
+            results[message.pk] = str(e) or e.__class__.__name__
+        return
+    try:
+        for message in messages:
+            email = EmailMessage(message.subject, message.body,
+                                 message.from_email, message.recipient_list(),
+                                 connection=connection)
+            try:
+                email.send()
+                results[message.pk] = None
+            except Exception as e:
+                results[message.pk] = str(e) or e.__class__.__name__
+    finally:
+        connection.close()
+
+
+def retry_time(attempts, retry_delay, now=None):
+    """Return when to retry a message which has failed ``attempts`` times
+
+    The delay is ``retry_delay`` seconds after the first failure and
+    doubles after each further failure.
+    """
+    if now is None:
+        now = datetime.now()
+    return now + timedelta(seconds=retry_delay * 2 ** (attempts - 1))
+
+
+def dispatch(batch_size=100, threads=1, max_attempts=5, retry_delay=60,
+             claim_timeout=600):
+    """Claim and send one batch of queued messages
+
+    The batch is divided between ``threads`` worker threads, each of
+    which keeps a single SMTP connection open.  Messages which fail are
+    retried on later calls after a delay which starts at
+    ``retry_delay`` seconds and doubles on every failure, until they
+    have been attempted ``max_attempts`` times.  The body of a message
+    is blanked once it has been sent or given up on, since it contains
+    the applicant's password.  Messages claimed by other dispatchers
+    are skipped for ``claim_timeout`` seconds.
+
+    Return a ``(sent, failed)`` tuple of message counts.
+    """
+    messages = claim_messages(batch_size, max_attempts, claim_timeout)
+    if not messages:
+        return 0, 0
+    threads = max(1, min(threads, len(messages)))
+    results = {}
+    workers = [threading.Thread(target=_send_chunk,
+                                args=(messages[i::threads], results))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    sent = [m for m in messages if results.get(m.pk, '') is None]
+    failed = [m for m in messages if results.get(m.pk, '') is not None]
+    if sent:
+        # The body is dropped since it contains the applicant's password.
+        QueuedEmail.objects.filter(pk__in=[m.pk for m in sent]).update(
+            date_sent=datetime.now(), body='', attempts=F('attempts') + 1,
+            claimed_by='', claimed_at=None)
+        _clear_confirmation_flags(sent)
+    for message in failed:
+        error = results.get(message.pk) or 'not sent'
+        logging.warning('Sending queued e-mail %r failed: %s',
+                        message.pk, error)
+        values = dict(attempts=F('attempts') + 1, last_error=error,
+                      next_attempt=retry_time(message.attempts + 1,
+                                              retry_delay),
+                      claimed_by='', claimed_at=None)
+        if message.attempts + 1 >= max_attempts:
+            values['body'] = ''
+        QueuedEmail.objects.filter(pk=message.pk).update(**values)
+    return len(sent), len(failed)
+
+
+def _clear_confirmation_flags(messages):
+    object_ids = {}
+    for message in messages:
+        if message.content_type_id is not None:
+            object_ids.setdefault(message.content_type_id, []).append(
+                message.object_id)
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        model._default_manager.filter(pk__in=ids).update(
+            send_confirmation_email=False)
@@ -0,0 +1,72 @@
+"""Roles of users in relation to the applications of a project
+
+Computing a role requires loading the permissions of the user, so the
+result is cached in the session.  The cached roles are stamped with a
+permission version which is kept in the cache backend and bumped
+whenever permissions or group memberships change.  A cache backend
+shared between processes (e.g. memcached) is needed for the bump to
+reach all processes.
+"""
+
+from time import time
+
+from django.core.cache import cache
+
+APPLICANT = 'applicant'
+REVIEWER = 'reviewer'
+SECRETARY = 'secretary'
+
+SESSION_KEY = '_candidates_roles'
+VERSION_CACHE_KEY = 'candidates:permission_version'
+# A timeout of 0 expires the entry immediately on most backends, and
+# memcached reads timeouts above 30 days as timestamps.  A version lost
+# from the cache only makes the sessions recompute their roles once.
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def permission_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Start from a timestamp so that a version lost from the cache
+        # isn't reused.
+        version = int(time() * 1000)
+        cache.add(VERSION_CACHE_KEY, version, VERSION_TIMEOUT)
+        version = cache.get(VERSION_CACHE_KEY, version)
+    return version
+
+
+def bump_permission_version(**kwargs):
+    """Invalidate the roles cached in all sessions
+
+    Connected to the signals sent when permissions or groups change.
+    """
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, int(time() * 1000), VERSION_TIMEOUT)
+
+
+def cached_role(request, key, compute_role):
+    """Return the role of the logged in user, cached in the session
+
+    ``key`` identifies the set of applications the role is about, and
+    ``compute_role`` is called with the user on a cache miss.
+    Anonymous users are always applicants.
+    """
+    user = request.user
+    if not user.is_authenticated():
+        return APPLICANT
+    stamp = (user.pk, user.is_active, user.is_superuser,
+             permission_version())
+    roles = request.session.get(SESSION_KEY, {})
+    try:
+        cached_stamp, role = roles[key]
+    except KeyError:
+        pass
+    else:
+        if cached_stamp == stamp:
+            return role
+    role = compute_role(user)
+    roles[key] = stamp, role
+    request.session[SESSION_KEY] = roles
+    return role
@@ -0,0 +1,167 @@
+"""Full-text search over applications
+
+Each application keeps a normalized ``search_document`` with the name
+and e-mail address of the applicant and the fields listed in the
+``search_fields`` attribute of the application model.  The document is
+updated when the application is saved.  A name or e-mail address changed
+through the user alone, e.g. in the admin, leaves the document stale
+until the application is saved again or the ``rebuild_search_index``
+management command is run.
+
+The backend is chosen with the dotted path in the
+``CANDIDATES_SEARCH_BACKEND`` setting:
+
+* :class:`SimpleSearchBackend` (the default) matches words with
+  ``LIKE`` and needs no database support
+* :class:`SqliteSearchBackend` uses an SQLite FTS5 table kept up to
+  date by triggers
+* :class:`PostgresqlSearchBackend` uses a GIN-indexed ``tsvector``
+  expression
+
+The FTS table, triggers and indexes are created by the
+``rebuild_search_index`` management command.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.importlib import import_module
+
+from candidates.utils.users import remove_diacritics
+
+DEFAULT_BACKEND = 'candidates.search.SimpleSearchBackend'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_backends = {}
+
+
+def search_words(text):
+    """Split text into lowercase words without diacritics"""
+    if not isinstance(text, unicode):
+        text = unicode(text)
+    return WORD_RE.findall(remove_diacritics(text.lower()))
+
+
+def build_search_document(values):
+    """Return the normalized search document for a list of values"""
+    words = []
+    for value in values:
+        if value is not None:
+            words.extend(search_words(value))
+    return u' '.join(words)
+
+
+class SimpleSearchBackend(object):
+    """Match every word of the query anywhere in the search document
+
+    Results are ordered by the last update, newest first.
+    """
+    def install(self, model):
+        pass
+
+    def search(self, queryset, query):
+        for word in search_words(query):
+            queryset = queryset.filter(search_document__contains=word)
+        return queryset.order_by('-date_updated', '-pk')
+
+
+class SqliteSearchBackend(object):
+    """Search an FTS5 table which indexes the search documents
+
+    The table uses the application table as external content and is
+    kept up to date by triggers.  Results are ranked with BM25.
+    """
+    def fts_table(self, model):
+        return '%s_fts' % model._meta.db_table
+
+    def install(self, model):
+        names = {'table': model._meta.db_table,
+                 'pk': model._meta.pk.column,
+                 'fts': self.fts_table(model)}
+        cursor = connection.cursor()
+        for statement in [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS %(fts)s USING fts5("
+            "search_document, content='%(table)s', "
+            "content_rowid='%(pk)s')",
+            "CREATE TRIGGER IF NOT EXISTS %(fts)s_insert "
+            "AFTER INSERT ON %(table)s BEGIN "
+            "INSERT INTO %(fts)s(rowid, search_document) "
+            "VALUES (new.%(pk)s, new.search_document); END",
+            "CREATE TRIGGER IF NOT EXISTS %(fts)s_delete "
+            "AFTER DELETE ON %(table)s BEGIN "
+            "INSERT INTO %(fts)s(%(fts)s, rowid, search_document) "
+            "VALUES ('delete', old.%(pk)s, old.search_document); END",
+            "CREATE TRIGGER IF NOT EXISTS %(fts)s_update "
+            "AFTER UPDATE OF search_document ON %(table)s BEGIN "
+            "INSERT INTO %(fts)s(%(fts)s, rowid, search_document) "
+            "VALUES ('delete', old.%(pk)s, old.search_document); "
+            "INSERT INTO %(fts)s(rowid, search_document) "
+            "VALUES (new.%(pk)s, new.search_document); END",
+            "INSERT INTO %(fts)s(%(fts)s) VALUES ('rebuild')"]:
+            cursor.execute(statement % names)
+        transaction.commit_unless_managed()
+
+    def search(self, queryset, query):
+        words = search_words(query)
+        if not words:
+            return queryset.none()
+        model = queryset.model
+        fts = self.fts_table(model)
+        # Quoted words with a prefix match, e.g. "virta"* "maria"*
+        match = u' '.join(u'"%s"*' % word for word in words)
+        return queryset.extra(
+            select={'search_rank': 'bm25(%s)' % fts},
+            tables=[fts],
+            where=['%s.rowid = %s.%s' % (fts, model._meta.db_table,
+                                         model._meta.pk.column),
+                   '%s MATCH %%s' % fts],
+            params=[match],
+            order_by=['search_rank'])
+
+
+class PostgresqlSearchBackend(object):
+    """Search a GIN-indexed ``tsvector`` of the search documents
+
+    The ``simple`` text search configuration is used by default, since
+    the documents are already normalized.  Results are ranked with
+    ``ts_rank``.
+    """
+    config = 'simple'
+
+    def vector(self, model):
+        return "to_tsvector('%s', %s.search_document)" % (
+            self.config, model._meta.db_table)
+
+    def install(self, model):
+        table = model._meta.db_table
+        cursor = connection.cursor()
+        cursor.execute('DROP INDEX IF EXISTS %s_search' % table)
+        cursor.execute("CREATE INDEX %s_search ON %s "
+                       "USING gin (to_tsvector('%s', search_document))" %
+                       (table, table, self.config))
+        transaction.commit_unless_managed()
+
+    def search(self, queryset, query):
+        words = search_words(query)
+        if not words:
+            return queryset.none()
+        vector = self.vector(queryset.model)
+        tsquery = "to_tsquery('%s', %%s)" % self.config
+        match = u' & '.join(u'%s:*' % word for word in words)
+        return queryset.extra(
+            select={'search_rank': 'ts_rank(%s, %s)' % (vector, tsquery)},
+            select_params=[match],
+            where=['%s @@ %s' % (vector, tsquery)],
+            params=[match],
+            order_by=['-search_rank'])
+
+
+def get_search_backend():
+    """Return the backend configured in settings, one instance per path"""
+    path = getattr(settings, 'CANDIDATES_SEARCH_BACKEND', DEFAULT_BACKEND)
+    if path not in _backends:
+        module_name, name = path.rsplit('.', 1)
+        _backends[path] = getattr(import_module(module_name), name)()
+    return _backends[path]
@@ -1,7 +1,10 @@
+from datetime import date, datetime
+
 from django.test import TestCase
 from django.conf import settings
+from pytz import utc
 
-from candidates.views import MetaBase, EditApplicationBase
+from candidates.views import MetaBase, EditApplicationBase, memoize_round
 from candidates.tests.models import TestModel
 
 saved_settings = {}
@@ -48,9 +51,71 @@ class MetaSubclassTests(OverrideSettingsTestCase):
                          'view_mymodel')
 
 
+class CountingMeta(MetaBase):
+    calls = 0
+
+    @classmethod
+    def current_round_name(cls):
+        cls.calls += 1
+        return '2010'
+
+
+class RoundMemoizationTests(OverrideSettingsTestCase):
+    def setUp(self):
+        super(RoundMemoizationTests, self).setUp()
+        class meta(CountingMeta):
+            pass
+        self.meta = meta
+
+    def tearDown(self):
+        MetaBase.invalidate_round_cache()
+        super(RoundMemoizationTests, self).tearDown()
+
+    def test_01_not_memoized_outside_request(self):
+        self.meta.resolve_round_name()
+        self.meta.resolve_round_name()
+        self.assertEqual(self.meta.calls, 2)
+
+    def test_02_memoized_during_request(self):
+        @memoize_round
+        def view():
+            return [self.meta.resolve_round_name() for i in range(5)]
+        self.assertEqual(view(), ['2010'] * 5)
+        self.assertEqual(self.meta.calls, 1)
+        view()
+        self.assertEqual(self.meta.calls, 2)
+
+    def test_03_process_cache(self):
+        self.meta.round_cache_timeout = 60
+        self.meta.resolve_round_name()
+        self.meta.resolve_round_name()
+        self.assertEqual(self.meta.calls, 1)
+        self.meta.invalidate_round_cache()
+        self.meta.resolve_round_name()
+        self.assertEqual(self.meta.calls, 2)
+
+
 class EditApplicationBaseTests(OverrideSettingsTestCase):
     def test_01_abstract_meta(self):
         self.assertRaises(NotImplementedError,
                           EditApplicationBase.meta.get_deadline)
         self.assertRaises(NotImplementedError,
                           EditApplicationBase.meta.get_view_permission)
+
+    def test_02_deadline_cutoff(self):
+        class meta(MetaBase):
+            @staticmethod
+            def get_deadline():
+                return date(2010, 3, 1)
+        class view(EditApplicationBase):
+            pass
+        view.meta = meta
+        self.assertEqual(view.deadline_cutoff(),
+                         datetime(2010, 3, 2, 10, 0, tzinfo=utc))
+        self.assertFalse(view.is_past_deadline(
+                datetime(2010, 3, 2, 9, 59, tzinfo=utc)))
+        self.assertTrue(view.is_past_deadline(
+                datetime(2010, 3, 2, 10, 0, tzinfo=utc)))
+        view.timezone = 'Europe/Helsinki'
+        self.assertEqual(view.deadline_cutoff(),
+                         datetime(2010, 3, 1, 22, 0, tzinfo=utc))
@@ -0,0 +1,91 @@
+from nose.tools import eq_, ok_
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+
+from candidates.admission import AdmissionController
+from candidates.instrumentation import get_sink
+from candidates.tests.views_tests import rf
+from candidates_test_app.models import Application
+from candidates_test_app.views import EditApplication
+
+
+class LimitedEditApplication(EditApplication):
+    admission_limit = 1
+    admission_timeout = 0
+
+
+class AdmissionControllerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_local_limit(self):
+        controller = AdmissionController('test', 1, timeout=0)
+        ok_(controller.acquire())
+        ok_(not controller.acquire())
+        controller.release()
+        ok_(controller.acquire())
+        eq_((controller.admitted, controller.rejected), (2, 1))
+
+    def test_shared_limit(self):
+        first = AdmissionController('test', 1, timeout=0, shared_limit=1)
+        second = AdmissionController('test', 1, timeout=0, shared_limit=1)
+        ok_(first.acquire())
+        ok_(not second.acquire())
+        eq_(second.active, 0)
+        first.release()
+        ok_(second.acquire())
+
+
+class AdmissionMetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.old_settings = (settings.CANDIDATES_INSTRUMENTATION,
+                             settings.CANDIDATES_INSTRUMENTATION_SINK)
+        settings.CANDIDATES_INSTRUMENTATION = True
+        settings.CANDIDATES_INSTRUMENTATION_SINK = \
+            'candidates.instrumentation.MemorySink'
+        self.sink = get_sink()
+        self.sink.gauges = {}
+
+    def tearDown(self):
+        (settings.CANDIDATES_INSTRUMENTATION,
+         settings.CANDIDATES_INSTRUMENTATION_SINK) = self.old_settings
+
+    def test_gauges_go_down(self):
+        controller = AdmissionController('test', 1, timeout=0,
+                                         shared_limit=1)
+        ok_(controller.acquire())
+        eq_(self.sink.gauges['admission.test.active'], 1)
+        eq_(self.sink.gauges['admission.test.shared_active'], 1)
+        ok_(not controller.acquire())
+        eq_(self.sink.gauges['admission.test.waiting'], 0)
+        controller.release()
+        eq_(self.sink.gauges['admission.test.active'], 0)
+        eq_(self.sink.gauges['admission.test.shared_active'], 0)
+
+    def test_view_controller_named_by_module(self):
+        eq_(LimitedEditApplication.admission_controller().name,
+            'candidates.tests.admission_tests.LimitedEditApplication')
+
+
+class BusyResponseTests(TestCase):
+    data = {'user-email': 'edwin@moses.com',
+            'user-first_name': 'Edwin',
+            'user-last_name': 'Moses',
+            'application-cv': "I'm good",
+            'application-experience_years': '5'}
+
+    def test_rejected_post_keeps_data(self):
+        controller = LimitedEditApplication.admission_controller()
+        controller.acquire()
+        try:
+            response = LimitedEditApplication(
+                rf.post('/', self.data), _render=False)
+        finally:
+            controller.release()
+        eq_(response._context['busy'], True)
+        eq_(response._context['user_form']['first_name'].data, 'Edwin')
+        eq_(Application.objects.count(), 0)
@@ -0,0 +1,70 @@
+import re
+
+from nose.tools import eq_, ok_
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from django.contrib.auth.models import User
+from candidates_test_app.models import Application
+
+from candidates.management.commands import resend_confirmation_emails
+
+
+class CheckingConnection(object):
+    """Check that the password is stored before the message is sent
+
+    Sending to ``user1`` fails.
+    """
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            password = re.search(r'entering your password: (\S+)',
+                                 message.body).group(1)
+            ok_(User.objects.get(email=message.to[0]).check_password(
+                    password))
+            if message.to[0] == 'user1@cool.net':
+                raise IOError('Mailbox unavailable')
+
+
+class ResendConfirmationEmailsTests(TestCase):
+
+    def setUp(self):
+        for i, send in enumerate([True, True, False]):
+            user = User.objects.create(username='user%d' % i,
+                                       email='user%d@cool.net' % i)
+            Application.objects.create(
+                user=user, round_name='2010', cv='cv', experience_years=1,
+                send_confirmation_email=send)
+
+    def test_resend(self):
+        call_command('resend_confirmation_emails',
+                     'candidates_test_app.views.EditApplication',
+                     round_name='2010', batch_size=1, rate=1000)
+        eq_(sorted(m.to[0] for m in mail.outbox),
+            ['user0@cool.net', 'user1@cool.net'])
+        eq_(Application.objects.filter(send_confirmation_email=True).count(),
+            0)
+        for message in mail.outbox:
+            password = re.search(r'entering your password: (\S+)',
+                                 message.body).group(1)
+            ok_(User.objects.get(email=message.to[0]).check_password(
+                    password))
+
+    def test_password_stored_before_sending(self):
+        get_connection = resend_confirmation_emails.get_connection
+        resend_confirmation_emails.get_connection = (
+            lambda **kwargs: CheckingConnection())
+        try:
+            call_command('resend_confirmation_emails',
+                         'candidates_test_app.views.EditApplication',
+                         round_name='2010', batch_size=10, rate=1000)
+        finally:
+            resend_confirmation_emails.get_connection = get_connection
+        eq_([a.user.username for a in Application.objects.filter(
+                    send_confirmation_email=True)], ['user1'])
@@ -0,0 +1,61 @@
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from nose.tools import eq_
+from django.test import TestCase
+
+from django.contrib.auth.models import User
+from candidates_test_app.models import Application
+
+from candidates.export import export_columns, export_lines, export_queryset
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        for i, name in enumerate([u'Candy', u'M\xe4rta']):
+            user = User.objects.create(username='user%d' % i,
+                                       first_name=name,
+                                       last_name='Candidate',
+                                       email='user%d@cool.net' % i)
+            Application.objects.create(user=user, round_name='2010',
+                                       cv='cv %d' % i, experience_years=i)
+        user = User.objects.create(username='other')
+        Application.objects.create(user=user, round_name='2009',
+                                   cv='cv', experience_years=1)
+
+    def test_columns(self):
+        columns = export_columns(Application)
+        eq_(columns[-4:], ['user__username', 'user__first_name',
+                           'user__last_name', 'user__email'])
+        eq_('cv' in columns, True)
+        eq_('user_id' in columns, False)
+        for internal in ['confirmation_salt', 'applicant_key',
+                         'search_document']:
+            eq_(internal in columns, False)
+
+    def test_salt_not_exported(self):
+        salt = Application.objects.get(round_name='2009').confirmation_salt
+        lines = list(export_lines(export_queryset(Application, '2009'),
+                                  export_columns(Application), 'csv'))
+        eq_(len(lines), 2)
+        eq_(any(salt in line for line in lines), False)
+
+    def test_csv(self):
+        lines = list(export_lines(export_queryset(Application, '2010'),
+                                  ['cv', 'user__first_name'], 'csv',
+                                  chunk_size=1))
+        eq_(lines, ['cv,user__first_name\r\n',
+                    'cv 0,Candy\r\n',
+                    'cv 1,M\xc3\xa4rta\r\n'])
+
+    def test_jsonl(self):
+        lines = list(export_lines(export_queryset(Application, '2009'),
+                                  ['round_name', 'experience_years'],
+                                  'jsonl'))
+        eq_(len(lines), 1)
+        eq_(lines[0][-1], '\n')
+        eq_(json.loads(lines[0]),
+            {'round_name': '2009', 'experience_years': 1})
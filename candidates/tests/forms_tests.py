@@ -4,7 +4,12 @@ from django.test import TestCase
 from django.contrib.auth.models import User
 from candidates_test_app.models import Application
 
-from candidates.forms import user_exists
+from django import forms
+from django.forms.formsets import formset_factory, BaseFormSet
+from django.http import QueryDict
+
+from candidates.forms import user_exists, UserForm, autostrip, \
+    StripWhitespaceMixin, StripWhitespaceFormSetMixin
 
 
 class UserExistsTestCase(TestCase):
@@ -21,3 +26,77 @@ class UserExistsTestCase(TestCase):
     def test_email_mismatch(self):
         eq_(user_exists('candy2@cool.net', 'Candidate', 'Candy', '2010'),
             False)
+
+    def test_key_exists(self):
+        ok_(user_exists(' Candy@Cool.net', 'candidate ', u'C\xe1ndy', '2010',
+                        application_model=Application))
+
+    def test_key_round_mismatch(self):
+        eq_(user_exists('candy@cool.net', 'Candidate', 'Candy', '2011',
+                        application_model=Application),
+            False)
+
+
+class NameForm(StripWhitespaceMixin, forms.Form):
+    name = forms.CharField()
+    count = forms.IntegerField()
+
+
+class NameFormSet(StripWhitespaceFormSetMixin, BaseFormSet):
+    pass
+
+
+class StripWhitespaceTests(TestCase):
+
+    def test_user_form(self):
+        form = UserForm(data=QueryDict('user-email=+a@b.fi+&'
+                                       'user-first_name=+Bo&'
+                                       'user-last_name=Ek+'),
+                        prefix='user', current_round_name='2010')
+        ok_(form.is_valid())
+        eq_(form.cleaned_data, {'email': 'a@b.fi',
+                                'first_name': 'Bo',
+                                'last_name': 'Ek'})
+
+    def test_fields_not_modified(self):
+        ok_('clean' not in UserForm.base_fields['email'].__dict__)
+
+    def test_autostrip_keeps_class(self):
+        class PlainForm(forms.Form):
+            name = forms.CharField()
+
+            def __init__(self, *args, **kwargs):
+                super(PlainForm, self).__init__(*args, **kwargs)
+        StrippingForm = autostrip(PlainForm)
+        ok_(StrippingForm is PlainForm)
+        ok_('clean' not in PlainForm.base_fields['name'].__dict__)
+        form = PlainForm({'name': ' Bo '})
+        ok_(form.is_valid())
+        eq_(form.cleaned_data['name'], 'Bo')
+
+    def test_only_prefixed_values_copied(self):
+        form = NameForm({'a-name': ' Bo', 'a-count': '1', 'b-name': 'Ek'},
+                        prefix='a')
+        eq_(sorted(form.data.keys()), ['a-count', 'a-name'])
+        eq_(form.data['a-name'], 'Bo')
+
+    def test_query_dict_left_alone(self):
+        data = QueryDict('a-name=+Bo&a-count=1&b-name=Ek+&b-count=2')
+        first = NameForm(data, prefix='a')
+        second = NameForm(data, prefix='b')
+        eq_(first.data.getlist('a-name'), ['Bo'])
+        eq_(second.data.getlist('b-name'), ['Ek'])
+        ok_(first.data is not data)
+        eq_(data['b-name'], 'Ek ')
+
+    def test_formset_strips_once(self):
+        FormSet = formset_factory(NameForm, formset=NameFormSet)
+        data = {'form-TOTAL_FORMS': '2', 'form-INITIAL_FORMS': '0',
+                'form-0-name': ' Bo ', 'form-0-count': ' 1',
+                'form-1-name': 'Ek  ', 'form-1-count': '2 '}
+        formset = FormSet(data)
+        ok_(formset.is_valid())
+        eq_([f.cleaned_data for f in formset.forms],
+            [{'name': 'Bo', 'count': 1}, {'name': 'Ek', 'count': 2}])
+        ok_(all(f.data is formset.data for f in formset.forms))
+        eq_(data['form-0-name'], ' Bo ')
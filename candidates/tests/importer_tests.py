@@ -0,0 +1,64 @@
+from nose.tools import eq_, ok_
+from django.test import TestCase
+
+from django.contrib.auth.models import User
+from candidates_test_app.forms import ApplicationForm
+from candidates_test_app.models import Application
+
+from candidates.importer import ApplicationImporter, read_csv
+
+
+def row(first_name, last_name, email, cv='cv', experience_years='1'):
+    return {'user__first_name': first_name,
+            'user__last_name': last_name,
+            'user__email': email,
+            'cv': cv,
+            'experience_years': experience_years}
+
+
+class ImporterTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='edwinmoses2010',
+                                   first_name='Edwin', last_name='Moses',
+                                   email='edwin@moses.com')
+        Application.objects.create(user=user, round_name='2010', cv='cv',
+                                   experience_years=1)
+        self.importer = ApplicationImporter(Application, ApplicationForm,
+                                            '2010', chunk_size=2)
+
+    def test_import(self):
+        imported, rejects = self.importer.import_rows([
+                row('Edwin', 'Moses', 'edwin@hurdles.com'),
+                row('Edwin', 'Moses', 'edwin2@hurdles.com'),
+                row('Carl', 'Lewis', 'carl@lewis.com')])
+        eq_(imported, 3)
+        eq_(rejects, [])
+        eq_(sorted(User.objects.filter(
+                    last_name='Moses').values_list('username', flat=True)),
+            ['edwinmoses2010', 'edwinmoses2010_2', 'edwinmoses2010_3'])
+        appl = Application.objects.get(user__email='carl@lewis.com')
+        eq_(appl.round_name, '2010')
+        eq_(appl.applicant_key, u'2010|lewis|carl|carl@lewis.com')
+        ok_(appl.confirmation_salt)
+        ok_(appl.send_confirmation_email)
+        ok_(not appl.user.has_usable_password())
+
+    def test_rejects(self):
+        imported, rejects = self.importer.import_rows([
+                row('Edwin', 'Moses', 'EDWIN@moses.com'),
+                row('Carl', 'Lewis', 'carl@lewis.com', experience_years='x'),
+                row('Carl', 'Lewis', 'not an address'),
+                row('Jesse', 'Owens', 'jesse@owens.com'),
+                row('Jesse', 'Owens', 'jesse@owens.com')])
+        eq_(imported, 1)
+        eq_(sorted((line, sorted(errors)) for line, data, errors in rejects),
+            [(1, ['__all__']),
+             (2, ['experience_years']),
+             (3, ['user__email']),
+             (5, ['__all__'])])
+
+    def test_read_csv(self):
+        rows = list(read_csv(['user__first_name,cv\n',
+                              'M\xc3\xa4rta,cv\n']))
+        eq_(rows, [{'user__first_name': u'M\xe4rta', 'cv': u'cv'}])
@@ -0,0 +1,57 @@
+from nose.tools import eq_
+from django.conf import settings
+from django.test import TestCase
+
+from candidates.instrumentation import get_sink, instrumented, timed
+from candidates.tests.views_tests import rf
+from candidates_test_app.views import EditApplication
+
+
+class InstrumentationTests(TestCase):
+    data = {'user-email': 'edwin@moses.com',
+            'user-first_name': 'Edwin',
+            'user-last_name': 'Moses',
+            'application-cv': "I'm good",
+            'application-experience_years': '5'}
+
+    def setUp(self):
+        self.old_settings = (settings.CANDIDATES_INSTRUMENTATION,
+                             settings.CANDIDATES_INSTRUMENTATION_SINK)
+        settings.CANDIDATES_INSTRUMENTATION = True
+        settings.CANDIDATES_INSTRUMENTATION_SINK = \
+            'candidates.instrumentation.MemorySink'
+        self.sink = get_sink()
+        self.sink.profiles = []
+
+    def tearDown(self):
+        (settings.CANDIDATES_INSTRUMENTATION,
+         settings.CANDIDATES_INSTRUMENTATION_SINK) = self.old_settings
+
+    def test_edit_application_phases(self):
+        EditApplication(rf.post('/', self.data), _render=False)
+        eq_(len(self.sink.profiles), 1)
+        profile = self.sink.profiles[0]
+        eq_(profile.name, 'edit_application')
+        eq_(profile.durations.keys(),
+            ['permission', 'deadline', 'forms', 'validation', 'save_user',
+             'save_application', 'email'])
+        eq_(sum(profile.queries.values()) <= profile.query_count, True)
+        eq_(profile.queries['save_user'] > 0, True)
+
+    def test_nested_profiles_are_merged(self):
+        @instrumented('inner')
+        def inner():
+            return timed('phase', lambda: 1)
+
+        @instrumented('outer')
+        def outer():
+            return inner() + timed('phase', lambda: 1)
+
+        eq_(outer(), 2)
+        eq_([profile.name for profile in self.sink.profiles], ['outer'])
+        eq_(self.sink.profiles[0].queries['phase'], 0)
+
+    def test_disabled(self):
+        settings.CANDIDATES_INSTRUMENTATION = False
+        EditApplication(rf.post('/', self.data), _render=False)
+        eq_(self.sink.profiles, [])
@@ -0,0 +1,81 @@
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+from base64 import b32encode
+
+from nose.tools import eq_, ok_
+from django.conf import settings
+from django.test import TestCase
+
+from django.contrib.auth.models import User
+from candidates_test_app.models import Application
+
+
+class ConfirmationCodeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='candy', email='candy@cool.net')
+        self.appl = Application.objects.create(
+            user=self.user, round_name='2010', cv='cv', experience_years=2)
+
+    def test_salt_assigned_on_save(self):
+        eq_(len(self.appl.confirmation_salt), 16)
+
+    def test_code_does_not_need_user(self):
+        appl = Application.objects.only(
+            'confirmation_salt').get(pk=self.appl.pk)
+        eq_(appl.confirmation_code, self.appl.confirmation_code)
+        eq_(len(appl.confirmation_code), 12)
+
+    def test_code_changes_with_salt(self):
+        code = self.appl.confirmation_code
+        self.appl.confirmation_salt = 'A' * 16
+        ok_(self.appl.confirmation_code != code)
+
+    def test_legacy_code(self):
+        Application.objects.filter(pk=self.appl.pk).update(
+            confirmation_salt='')
+        appl = Application.objects.get(pk=self.appl.pk)
+        plaintext = '%d%s%s' % (appl.pk, 'candy@cool.net',
+                                settings.SECRET_KEY)
+        eq_(appl.confirmation_code, b32encode(sha1(plaintext).digest())[:12])
+        appl.user.email = 'candy@hot.net'
+        ok_(appl.confirmation_code !=
+            b32encode(sha1(plaintext).digest())[:12])
+
+    def test_legacy_code_survives_edit(self):
+        Application.objects.filter(pk=self.appl.pk).update(
+            confirmation_salt='')
+        appl = Application.objects.get(pk=self.appl.pk)
+        code = appl.confirmation_code
+        appl.cv = 'new cv'
+        appl.save()
+        appl = Application.objects.get(pk=self.appl.pk)
+        eq_(appl.confirmation_salt, '')
+        ok_(appl.check_confirmation_code(code))
+
+    def test_check_confirmation_code(self):
+        ok_(self.appl.check_confirmation_code(self.appl.confirmation_code))
+        ok_(not self.appl.check_confirmation_code('A' * 12))
+
+    def test_mark_confirmed(self):
+        date_updated = Application.objects.get(pk=self.appl.pk).date_updated
+        ok_(Application.mark_confirmed(self.appl.pk))
+        appl = Application.objects.get(pk=self.appl.pk)
+        ok_(appl.confirmed)
+        eq_(appl.date_updated, date_updated)
+        ok_(not Application.mark_confirmed(self.appl.pk))
+
+
+class SearchDocumentTests(TestCase):
+
+    def test_document_updated_on_save(self):
+        user = User.objects.create(
+            username='jerome', first_name=u'J\xe9r\xf4me',
+            last_name='Dvorak', email='jd@cool.net')
+        appl = Application.objects.create(
+            user=user, round_name='2010', cv=u'Pi\xe1no,  SINGING',
+            experience_years=2)
+        eq_(appl.search_document, u'jerome dvorak jd cool net piano singing')
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+from nose.tools import eq_, ok_
+from django.test import TestCase
+from django.core import mail
+
+from django.contrib.auth.models import User
+from candidates_test_app.models import Application
+
+from candidates.models import QueuedEmail
+from candidates import outbox
+from candidates.outbox import queue_email, dispatch
+
+
+class FailingConnection(object):
+    def open(self):
+        raise IOError('Connection refused')
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='candy', email='candy@cool.net')
+        self.appl = Application.objects.create(
+            user=self.user, round_name='2010', cv='cv', experience_years=2)
+
+    def test_queue_does_not_send(self):
+        queue_email('Subject', 'Body', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        eq_(len(mail.outbox), 0)
+        eq_(QueuedEmail.objects.filter(date_sent__isnull=True).count(), 1)
+        ok_(Application.objects.get(pk=self.appl.pk).send_confirmation_email)
+
+    def test_requeue_replaces_pending_message(self):
+        queue_email('Subject', 'Old password', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        queue_email('Subject', 'New password', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        eq_([m.body for m in QueuedEmail.objects.all()], ['New password'])
+
+    def test_requeue_keeps_claimed_message(self):
+        old = queue_email('Subject', 'Old password', 'robot@localhost',
+                          ['candy@cool.net'], application=self.appl)
+        QueuedEmail.objects.filter(pk=old.pk).update(
+            claimed_by='other', claimed_at=datetime.now())
+        queue_email('Subject', 'New password', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        eq_([m.body for m in QueuedEmail.objects.all()],
+            ['Old password', 'New password'])
+        eq_(dispatch(), (1, 0))
+        eq_(mail.outbox[0].body, 'New password')
+
+    def test_dispatch_sends_and_clears_flag(self):
+        queue_email('Subject', 'Body', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        eq_(dispatch(batch_size=10, threads=2), (1, 0))
+        eq_(len(mail.outbox), 1)
+        eq_(mail.outbox[0].to, ['candy@cool.net'])
+        message = QueuedEmail.objects.get()
+        ok_(message.date_sent is not None)
+        eq_(message.body, '')
+        eq_(Application.objects.get(pk=self.appl.pk).send_confirmation_email,
+            False)
+        eq_(dispatch(), (0, 0))
+
+    def test_claimed_message_not_sent_twice(self):
+        message = queue_email('Subject', 'Body', 'robot@localhost',
+                              ['candy@cool.net'], application=self.appl)
+        QueuedEmail.objects.filter(pk=message.pk).update(
+            claimed_by='other', claimed_at=datetime.now())
+        eq_(dispatch(), (0, 0))
+        eq_(len(mail.outbox), 0)
+
+    def test_stale_claim_expires(self):
+        message = queue_email('Subject', 'Body', 'robot@localhost',
+                              ['candy@cool.net'], application=self.appl)
+        QueuedEmail.objects.filter(pk=message.pk).update(
+            claimed_by='other',
+            claimed_at=datetime.now() - timedelta(hours=1))
+        eq_(dispatch(claim_timeout=600), (1, 0))
+        message = QueuedEmail.objects.get()
+        eq_((message.claimed_by, message.claimed_at), ('', None))
+
+    def test_failure_backs_off(self):
+        queue_email('Subject', 'Body', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        get_connection = outbox.get_connection
+        outbox.get_connection = lambda **kwargs: FailingConnection()
+        try:
+            eq_(dispatch(retry_delay=60), (0, 1))
+            eq_(dispatch(retry_delay=60), (0, 0))
+            message = QueuedEmail.objects.get()
+            eq_(message.attempts, 1)
+            eq_(message.last_error, 'Connection refused')
+            ok_(message.next_attempt > datetime.now() + timedelta(seconds=50))
+            eq_(message.claimed_by, '')
+            QueuedEmail.objects.update(next_attempt=datetime.now())
+            eq_(dispatch(retry_delay=60), (0, 1))
+            message = QueuedEmail.objects.get()
+            eq_(message.attempts, 2)
+            ok_(message.next_attempt > datetime.now() + timedelta(seconds=110))
+        finally:
+            outbox.get_connection = get_connection
+        eq_(len(mail.outbox), 0)
+
+    def test_body_blanked_when_giving_up(self):
+        queue_email('Subject', 'Password', 'robot@localhost',
+                    ['candy@cool.net'], application=self.appl)
+        get_connection = outbox.get_connection
+        outbox.get_connection = lambda **kwargs: FailingConnection()
+        try:
+            eq_(dispatch(max_attempts=2, retry_delay=0), (0, 1))
+            eq_(QueuedEmail.objects.get().body, 'Password')
+            eq_(dispatch(max_attempts=2, retry_delay=0), (0, 1))
+        finally:
+            outbox.get_connection = get_connection
+        message = QueuedEmail.objects.get()
+        eq_((message.attempts, message.body), (2, ''))
@@ -0,0 +1,73 @@
+from time import sleep
+
+from nose.tools import eq_, ok_
+from django.core.cache import get_cache
+from django.test import TestCase
+
+from django.contrib.auth.models import User, AnonymousUser, Permission
+
+from candidates import roles
+from candidates.roles import APPLICANT, SECRETARY, SESSION_KEY, \
+    bump_permission_version, permission_version
+from candidates.tests.views_tests import rf, count_queries
+from candidates_test_app.views import ApplicationMeta
+
+
+class RoleTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='secretary')
+        self.permission = Permission.objects.get(
+            codename='change_application')
+
+    def get_request(self, user):
+        request = rf.get('/')
+        request.user = user
+        return request
+
+    def test_anonymous_is_applicant(self):
+        request = self.get_request(AnonymousUser())
+        role, queries = count_queries(ApplicationMeta.get_role, request)
+        eq_(role, APPLICANT)
+        eq_(queries, 0)
+        eq_(SESSION_KEY in request.session, False)
+
+    def test_role_cached_in_session(self):
+        self.user.user_permissions.add(self.permission)
+        request = self.get_request(User.objects.get(pk=self.user.pk))
+        eq_(ApplicationMeta.get_role(request), SECRETARY)
+        request.user = User.objects.get(pk=self.user.pk)
+        role, queries = count_queries(ApplicationMeta.get_role, request)
+        eq_(role, SECRETARY)
+        eq_(queries, 0)
+
+    def test_permission_change_invalidates_role(self):
+        self.user.user_permissions.add(self.permission)
+        request = self.get_request(User.objects.get(pk=self.user.pk))
+        eq_(ApplicationMeta.get_role(request), SECRETARY)
+        self.user.user_permissions.remove(self.permission)
+        request.user = User.objects.get(pk=self.user.pk)
+        eq_(ApplicationMeta.get_role(request), APPLICANT)
+
+
+class PermissionVersionTests(TestCase):
+
+    def setUp(self):
+        self.old_cache = roles.cache
+        roles.cache = get_cache('locmem://')
+
+    def tearDown(self):
+        roles.cache = self.old_cache
+
+    def test_version_kept_in_locmem_cache(self):
+        version = permission_version()
+        sleep(0.01)
+        eq_(permission_version(), version)
+
+    def test_bump_changes_version(self):
+        version = permission_version()
+        bump_permission_version()
+        sleep(0.01)
+        new_version = permission_version()
+        ok_(new_version != version)
+        eq_(permission_version(), new_version)
@@ -0,0 +1,53 @@
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from django.contrib.auth.models import User
+from candidates_test_app.models import Application
+
+from candidates.search import SqliteSearchBackend
+
+
+class SqliteSearchBackendTests(TestCase):
+
+    def setUp(self):
+        if not settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+            raise SkipTest('The FTS5 backend needs SQLite')
+        self.backend = SqliteSearchBackend()
+        self.create('maria', u'Maria', u'Virtanen', u'Piano, piano, piano')
+        self.backend.install(Application)
+        self.jerome = self.create('jerome', u'J\xe9r\xf4me', u'Pianowski',
+                                  u'Violin')
+
+    def tearDown(self):
+        cursor = connection.cursor()
+        fts = self.backend.fts_table(Application)
+        for trigger in ['insert', 'delete', 'update']:
+            cursor.execute('DROP TRIGGER IF EXISTS %s_%s' % (fts, trigger))
+        cursor.execute('DROP TABLE IF EXISTS %s' % fts)
+
+    def create(self, username, first_name, last_name, cv):
+        user = User.objects.create(username=username, first_name=first_name,
+                                   last_name=last_name)
+        return Application.objects.create(user=user, round_name='2010',
+                                          cv=cv, experience_years=1)
+
+    def search(self, query):
+        queryset = Application.objects.filter(round_name='2010')
+        return [a.user.username
+                for a in self.backend.search(queryset, query)]
+
+    def test_ranked_prefix_match(self):
+        eq_(self.search(u'PI\xc1N'), ['maria', 'jerome'])
+        eq_(self.search(u'jerome violin'), ['jerome'])
+        eq_(self.search(u'cello'), [])
+
+    def test_index_follows_updates(self):
+        self.jerome.cv = u'Cello'
+        self.jerome.save()
+        eq_(self.search(u'violin'), [])
+        eq_(self.search(u'cello'), ['jerome'])
+        Application.objects.filter(user__username='maria').delete()
+        eq_(self.search(u'piano'), ['jerome'])
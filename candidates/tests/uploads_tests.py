@@ -0,0 +1,80 @@
+from hashlib import sha256
+
+from nose.tools import eq_, ok_, assert_raises
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile
+from django.test import TestCase
+from django.utils.datastructures import MultiValueDict
+
+from candidates.forms import attachment_formset_factory
+from candidates.models import attachment_upload_to
+from candidates.uploads import AttachmentUploadHandler
+from candidates_test_app.models import Application, Attachment
+
+
+class Request(object):
+    pass
+
+
+class AttachmentUploadHandlerTests(TestCase):
+
+    def setUp(self):
+        self.old_max_size = getattr(settings, 'CANDIDATES_UPLOAD_MAX_SIZE',
+                                    None)
+        settings.CANDIDATES_UPLOAD_MAX_SIZE = 10
+        self.request = Request()
+        self.handler = AttachmentUploadHandler(self.request)
+
+    def tearDown(self):
+        settings.CANDIDATES_UPLOAD_MAX_SIZE = self.old_max_size
+
+    def upload(self, *chunks):
+        self.handler.new_file('attachments-0-file', 'cv.pdf',
+                              'application/pdf', None)
+        start = 0
+        for chunk in chunks:
+            self.handler.receive_data_chunk(chunk, start)
+            start += len(chunk)
+        return self.handler.file_complete(start)
+
+    def test_content_hash(self):
+        upload = self.upload('12345', '6789')
+        eq_(upload.content_hash, sha256('123456789').hexdigest())
+        eq_(self.request.rejected_uploads, {})
+
+    def test_oversized_upload_rejected(self):
+        assert_raises(SkipFile, self.upload, '123456', '789012')
+        ok_('attachments-0-file' in self.request.rejected_uploads)
+
+
+class AttachmentFormTests(TestCase):
+
+    def test_rejection_is_a_field_error(self):
+        files = MultiValueDict()
+        files.rejected = {'attachments-0-file': 'The file is too large.'}
+        FormSet = attachment_formset_factory(Application, Attachment)
+        formset = FormSet({'attachments-TOTAL_FORMS': '1',
+                           'attachments-INITIAL_FORMS': '0'},
+                          files, instance=Application(), prefix='attachments')
+        ok_(not formset.is_valid())
+        eq_(formset.forms[0].errors['file'], ['The file is too large.'])
+
+
+class AttachmentUploadToTests(TestCase):
+
+    def upload_to(self, filename, content_type):
+        attachment = Attachment(content_hash='ab12', content_type=content_type)
+        return attachment_upload_to(attachment, filename)
+
+    def test_extension_of_content_type(self):
+        eq_(self.upload_to('CV.PDF', 'application/pdf'),
+            'attachments/ab/ab12.pdf')
+        eq_(self.upload_to('cv.html', 'application/pdf'),
+            'attachments/ab/ab12.pdf')
+        eq_(self.upload_to('cv', 'application/pdf'),
+            'attachments/ab/ab12.pdf')
+
+    def test_unknown_content_type_has_no_extension(self):
+        eq_(self.upload_to('cv.html', ''), 'attachments/ab/ab12')
+        eq_(self.upload_to('cv.html', 'application/x-unknown'),
+            'attachments/ab/ab12')
@@ -0,0 +1,52 @@
+from nose.tools import eq_, ok_
+from django import forms
+from django.test import TestCase
+from django.utils.datastructures import SortedDict
+
+from candidates.validation import FormValidator, flatten_forms
+
+
+class NameForm(forms.Form):
+    name = forms.CharField()
+
+
+class ScannedForm(NameForm):
+    expensive_validation = True
+
+
+def name_form(name, form_class=NameForm):
+    return form_class({'name': name})
+
+
+class FormValidatorTests(TestCase):
+
+    def setUp(self):
+        self.forms = SortedDict([
+                ('first', name_form('')),
+                ('attachments', [name_form('a'), [name_form('b')]]),
+                ('scanned', name_form('c', ScannedForm))])
+
+    def test_flatten(self):
+        eq_([name for name, form in flatten_forms(self.forms)],
+            ['first', 'attachments.0', 'attachments.1.0', 'scanned'])
+
+    def test_validate_all(self):
+        validator = FormValidator(self.forms)
+        ok_(not validator.validate())
+        eq_(validator.errors.keys(), ['first'])
+        eq_(validator.skipped, ['scanned'])
+        eq_([name for name, seconds in validator.timings],
+            ['first', 'attachments.0', 'attachments.1.0'])
+
+    def test_stop_early(self):
+        validator = FormValidator(self.forms, stop_early=True)
+        ok_(not validator.validate())
+        eq_(validator.skipped, ['attachments.0', 'attachments.1.0',
+                                'scanned'])
+
+    def test_valid(self):
+        self.forms['first'] = name_form('x')
+        validator = FormValidator(self.forms)
+        ok_(validator.validate())
+        eq_(validator.errors, {})
+        eq_(len(validator.timings), 4)
@@ -1,9 +1,27 @@
+import re
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from django import forms
+from django.conf import settings
+from django.db import connection
+from django.template import context as template_context
 from django.test import TestCase, Client
+from django.core import mail
+from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import User
+from django.utils.datastructures import SortedDict
 from django.core.handlers.wsgi import WSGIRequest
 from django.core.handlers.base import BaseHandler
 from nose.tools import ok_, eq_
 
-from candidates_test_app.views import EditApplication
+from candidates import views
+from candidates.views import ApplicationListBase
+from candidates_test_app.views import EditApplication, ApplicationMeta, \
+    ConfirmApplication
 from candidates_test_app.models import Application
 
 
@@ -103,3 +121,367 @@ class SaveApplicationTests(TestCase):
         eq_(appl.user.username, u'edwinmoses2010')
         eq_(appl.user.last_name, u'Moses')
         eq_(appl.user.first_name, u'Edwin')
+
+    def test_username_taken_during_save(self):
+        """Another request takes the username just before the insert"""
+        allocate_username = views.allocate_username
+        raced = []
+        def allocate_taken_username(*args):
+            username = allocate_username(*args)
+            if not raced:
+                raced.append(User.objects.create(username=username))
+            return username
+        views.allocate_username = allocate_taken_username
+        try:
+            EditApplication(rf.post('/', FormsAfterSaveTests.data),
+                            _render=False)
+        finally:
+            views.allocate_username = allocate_username
+        eq_(raced[0].username, u'edwinmoses2010')
+        eq_(Application.objects.get().user.username, u'edwinmoses2010_2')
+        eq_(User.objects.count(), 2)
+
+    def test_new_user_logged_in_with_mailed_password(self):
+        data = {'user-email': 'edwin@moses.com',
+                'user-first_name': 'Edwin',
+                'user-last_name': 'Moses',
+                'application-cv': "I'm good",
+                'application-experience_years': '5'}
+        request = rf.post('/', data)
+        EditApplication(request, _render=False)
+        eq_(len(mail.outbox), 1)
+        password = re.search(r'entering your password: (\S+)',
+                             mail.outbox[0].body).group(1)
+        user = Application.objects.get().user
+        ok_(user.check_password(password))
+        eq_(request.session['_auth_user_id'], user.pk)
+
+
+class QueryingExtraForm(forms.Form):
+    """Extra form which, like a formset, queries the database"""
+    def __init__(self, *args, **kwargs):
+        super(QueryingExtraForm, self).__init__(*args, **kwargs)
+        self.user_count = User.objects.count()
+
+
+class EditApplicationWithExtraForm(EditApplication):
+    @classmethod
+    def create_extra_forms(cls, data, files, user, appl):
+        return SortedDict([
+                ('extra_form', QueryingExtraForm(data, prefix='extra'))])
+
+
+class EagerEditApplicationWithExtraForm(EditApplicationWithExtraForm):
+    lazy_forms_after_save = False
+
+
+def capture_queries(func, *args, **kwargs):
+    old_debug = settings.DEBUG
+    settings.DEBUG = True
+    start = len(connection.queries)
+    try:
+        result = func(*args, **kwargs)
+        return result, [q['sql'] for q in connection.queries[start:]]
+    finally:
+        settings.DEBUG = old_debug
+
+
+def count_queries(func, *args, **kwargs):
+    result, queries = capture_queries(func, *args, **kwargs)
+    return result, len(queries)
+
+
+def count_selects(model, func, *args, **kwargs):
+    """Count the queries which select rows from the table of ``model``"""
+    result, queries = capture_queries(func, *args, **kwargs)
+    table = ' FROM %s ' % connection.ops.quote_name(model._meta.db_table)
+    return result, len([sql for sql in queries
+                        if sql.startswith('SELECT') and table in sql])
+
+
+class FormsAfterSaveTests(TestCase):
+    data = {'user-email': 'edwin@moses.com',
+            'user-first_name': 'Edwin',
+            'user-last_name': 'Moses',
+            'application-cv': "I'm good",
+            'application-experience_years': '5'}
+
+    def test_lazy_forms_skip_queries(self):
+        eager_response, eager_queries = count_queries(
+            EagerEditApplicationWithExtraForm,
+            rf.post('/', self.data), _render=False)
+        Application.objects.all().delete()
+        User.objects.all().delete()
+        lazy_response, lazy_queries = count_queries(
+            EditApplicationWithExtraForm,
+            rf.post('/', self.data), _render=False)
+        eq_(lazy_queries, eager_queries - 1)
+
+        extra_form, queries = count_queries(
+            lambda: lazy_response._context['extra_form'].user_count)
+        eq_(queries, 1)
+
+    def test_lazy_forms_are_unbound(self):
+        response = EditApplication(rf.post('/', self.data), _render=False)
+        user_form = response._context['user_form']
+        eq_(user_form.__class__.__name__, 'UserForm')
+        ok_(not user_form.is_bound)
+        eq_(user_form.instance.username, 'edwinmoses2010')
+
+
+class RefetchingEditApplication(EditApplication):
+
+    @classmethod
+    def refresh_application(cls, application):
+        return cls.meta.model.objects.get(pk=application.pk)
+
+
+class QueuingEditApplication(EditApplication):
+    queue_confirmation_email = True
+
+
+class SavedApplicationQueryTests(TestCase):
+
+    def test_saved_application_not_refetched(self):
+        response, queries = count_queries(
+            EditApplication, rf.post('/', FormsAfterSaveTests.data),
+            _render=False)
+        Application.objects.all().delete()
+        User.objects.all().delete()
+        response, refetching_queries = count_queries(
+            RefetchingEditApplication,
+            rf.post('/', FormsAfterSaveTests.data), _render=False)
+        eq_(refetching_queries, queries + 1)
+
+    def test_post_selects_application_only_for_duplicates(self):
+        response, selects = count_selects(
+            Application, QueuingEditApplication,
+            rf.post('/', FormsAfterSaveTests.data), _render=False)
+        eq_(response._context['should_confirm'], True)
+        eq_(selects, 1)
+
+    def test_logged_in_get_selects_application_once(self):
+        EditApplication(rf.post('/', FormsAfterSaveTests.data), _render=False)
+        request = rf.get('/')
+        request.user = Application.objects.get().user
+        response, selects = count_selects(
+            Application, EditApplication, request, _render=False)
+        eq_(response._context['saved'], True)
+        eq_(response._context['should_confirm'], True)
+        eq_(selects, 1)
+
+
+class ApplicationList(ApplicationListBase):
+    meta = ApplicationMeta
+    paginate_by = 2
+
+
+class ApplicationListTests(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            user = User.objects.create(username='user%d' % i,
+                                       last_name='Last%d' % i,
+                                       first_name='First%d' % i)
+            Application.objects.create(
+                user=user, round_name='2010', cv='cv', experience_years=i)
+        user = User.objects.create(username='other')
+        Application.objects.create(
+            user=user, round_name='2009', cv='cv', experience_years=1)
+        self.secretary = User.objects.create(username='secretary',
+                                             is_superuser=True)
+
+    def get_response(self, user, **params):
+        request = rf.get('/', params)
+        request.user = user
+        return ApplicationList(request, round='2010', _render=False)
+
+    def get_page(self, **params):
+        return self.get_response(self.secretary, **params)._context
+
+    def test_only_staff_see_list(self):
+        applicant = User.objects.get(username='user0')
+        for user in [AnonymousUser(), applicant]:
+            response = self.get_response(user)
+            eq_(response.status_code, 403)
+            response = self.get_response(user, q='first0')
+            eq_(response.status_code, 403)
+
+    def test_keyset_pages(self):
+        pages = []
+        context = self.get_page(sort='date_created')
+        pages.append([a.experience_years for a in context['applications']])
+        while context['has_next']:
+            context = self.get_page(sort='date_created',
+                                    after=context['next_cursor'])
+            pages.append([a.experience_years
+                          for a in context['applications']])
+        eq_(pages, [[0, 1], [2, 3], [4]])
+
+    def test_default_sort_is_newest_first(self):
+        context = self.get_page()
+        eq_(context['sort'], '-date_created')
+        eq_([a.experience_years for a in context['applications']], [4, 3])
+
+    def test_user_loaded_in_same_query(self):
+        def render_names():
+            context = self.get_page()
+            return [a.username() for a in context['applications']]
+        names, queries = count_queries(render_names)
+        eq_(names, [u'Last4, First4', u'Last3, First3'])
+        eq_(queries, 1)
+
+    def test_search(self):
+        application = Application.objects.get(round_name='2010',
+                                              experience_years=3)
+        application.cv = u'Pi\xe1no lessons'
+        application.save()
+        context = self.get_page(q='first3')
+        eq_([a.experience_years for a in context['applications']], [3])
+        for query in [u'PI\xc1NO', u'piano', u'Piano Lessons']:
+            context = self.get_page(q=query)
+            eq_([a.experience_years for a in context['applications']], [3])
+            eq_(context['has_next'], False)
+        context = self.get_page(q=u'violin')
+        eq_([a.experience_years for a in context['applications']], [])
+
+
+class ConfirmApplicationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='candy', email='candy@cool.net')
+        self.appl = Application.objects.create(
+            user=user, round_name='2010', cv='cv', experience_years=2)
+
+    def confirm(self, code):
+        return ConfirmApplication(rf.get('/'),
+                                  application_id=str(self.appl.pk),
+                                  confirmation_code=code,
+                                  _render=False)
+
+    def test_valid_code_confirms(self):
+        response = self.confirm(self.appl.confirmation_code)
+        eq_(response.status_code, 302)
+        ok_(Application.objects.get(pk=self.appl.pk).confirmed)
+
+    def test_legacy_code_confirms_after_edit(self):
+        Application.objects.filter(pk=self.appl.pk).update(
+            confirmation_salt='')
+        self.appl = Application.objects.get(pk=self.appl.pk)
+        code = self.appl.confirmation_code
+        self.appl.experience_years = 3
+        self.appl.save()
+        response = self.confirm(code)
+        eq_(response.status_code, 302)
+        ok_(Application.objects.get(pk=self.appl.pk).confirmed)
+
+    def test_invalid_code_does_not_confirm(self):
+        response = self.confirm('A' * 12)
+        eq_(response.status_code, 302)
+        ok_(not Application.objects.get(pk=self.appl.pk).confirmed)
+
+
+class CachedEditApplication(EditApplication):
+    anonymous_form_cache_timeout = 60
+    handled_requests = 0
+
+    @classmethod
+    def handle_request(cls, *args, **kwargs):
+        cls.handled_requests += 1
+        return super(CachedEditApplication, cls).handle_request(
+            *args, **kwargs)
+
+
+visitor_contexts = []
+
+
+def visitor_context(request):
+    """Context processor which records the requests it sees"""
+    visitor_contexts.append(request)
+    return {'visitor': request.META.get('REMOTE_ADDR')}
+
+
+class AnonymousFormCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        CachedEditApplication.handled_requests = 0
+        del visitor_contexts[:]
+        self.old_processors = settings.TEMPLATE_CONTEXT_PROCESSORS
+        settings.TEMPLATE_CONTEXT_PROCESSORS = (
+            'candidates.tests.views_tests.visitor_context',)
+        template_context._standard_context_processors = None
+
+    def tearDown(self):
+        settings.TEMPLATE_CONTEXT_PROCESSORS = self.old_processors
+        template_context._standard_context_processors = None
+
+    def get(self, user):
+        request = rf.get('/')
+        request.user = user
+        return CachedEditApplication(request)
+
+    def test_anonymous_form_rendered_once(self):
+        first = self.get(AnonymousUser())
+        second = self.get(AnonymousUser())
+        eq_(CachedEditApplication.handled_requests, 1)
+        eq_(first.content, second.content)
+        ok_('The deadline for applications is' in second.content)
+
+    def test_context_processors_not_cached(self):
+        self.get(AnonymousUser())
+        self.get(AnonymousUser())
+        eq_(CachedEditApplication.handled_requests, 1)
+        eq_(visitor_contexts, [])
+
+    def test_authenticated_user_bypasses_cache(self):
+        user = User.objects.create(username='candy')
+        user.backend = settings.AUTHENTICATION_BACKENDS[0]
+        self.get(user)
+        self.get(user)
+        eq_(CachedEditApplication.handled_requests, 2)
+
+
+class AutosaveTests(TestCase):
+
+    def setUp(self):
+        EditApplication(rf.post('/', FormsAfterSaveTests.data), _render=False)
+        self.application = Application.objects.get()
+
+    def autosave(self, data, user=None):
+        request = rf.post('/', data)
+        request.user = user or self.application.user
+        response = EditApplication(request, _render=False)
+        return response, json.loads(response.content)
+
+    def test_saves_only_submitted_fields(self):
+        (response, result), queries = count_queries(
+            self.autosave, {'autosave': 'application',
+                            'application-cv': 'Piano playing'})
+        eq_(result, {'saved': True, 'fields': ['cv']})
+        eq_(queries, 2)
+        application = Application.objects.get()
+        eq_(application.cv, 'Piano playing')
+        eq_(application.experience_years, 5)
+        ok_('piano' in application.search_document)
+        ok_(application.date_updated > self.application.date_updated)
+
+    def test_invalid_field(self):
+        response, result = self.autosave({
+                'autosave': 'application',
+                'application-experience_years': 'many'})
+        eq_(result['saved'], False)
+        eq_(result['errors'].keys(), ['experience_years'])
+        eq_(Application.objects.get().experience_years, 5)
+
+    def test_unknown_prefix(self):
+        response, result = self.autosave({'autosave': 'user',
+                                          'user-first_name': 'Ed'})
+        eq_(response.status_code, 400)
+        eq_(Application.objects.get().user.first_name, 'Edwin')
+
+    def test_anonymous(self):
+        response, result = self.autosave({'autosave': 'application',
+                                          'application-cv': 'Piano'},
+                                         AnonymousUser())
+        eq_(response.status_code, 403)
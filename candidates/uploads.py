@@ -0,0 +1,112 @@
+"""Streaming upload handling for application attachments
+
+:class:`AttachmentUploadHandler` writes uploaded files to temporary
+files chunk by chunk, computing a SHA-256 hash of the content on the
+way and enforcing the size and content type limits.  An upload which
+breaks a limit is skipped as soon as the limit is reached, and the
+reason is recorded so :class:`candidates.forms.AttachmentForm` can show
+it to the applicant.
+
+The handler must see the request before the POST data is parsed, and
+``CsrfViewMiddleware`` parses it before the view runs, so install the
+handler in the settings::
+
+    FILE_UPLOAD_HANDLERS = ('candidates.uploads.AttachmentUploadHandler',)
+
+The limits are read from the ``CANDIDATES_UPLOAD_MAX_SIZE`` (in bytes,
+10 MiB by default) and ``CANDIDATES_UPLOAD_CONTENT_TYPES`` (a sequence
+of MIME types, any type by default) settings.
+"""
+
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler, \
+    SkipFile
+from django.template.defaultfilters import filesizeformat
+from django.utils.translation import ugettext
+
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+
+
+def file_hash(upload):
+    """Return the SHA-256 hex digest of a file, reading it in chunks
+
+    The hash is stored in the ``content_hash`` attribute of the file, so
+    it's computed only once.  :class:`AttachmentUploadHandler` computes
+    it while receiving the upload.
+    """
+    content_hash = getattr(upload, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    hasher = sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    upload.seek(0)
+    upload.content_hash = hasher.hexdigest()
+    return upload.content_hash
+
+
+class AttachmentUploadHandler(TemporaryFileUploadHandler):
+    """Hash uploads and enforce size and type limits while streaming
+
+    Rejected uploads are recorded in ``request.rejected_uploads``, a
+    dictionary of error messages keyed by the name of the file field.
+    """
+    def __init__(self, request=None):
+        super(AttachmentUploadHandler, self).__init__(request)
+        self.max_size = getattr(settings, 'CANDIDATES_UPLOAD_MAX_SIZE',
+                                DEFAULT_MAX_SIZE)
+        self.content_types = getattr(
+            settings, 'CANDIDATES_UPLOAD_CONTENT_TYPES', None)
+        self.rejected = {}
+        if request is not None:
+            request.rejected_uploads = self.rejected
+
+    def reject(self, message):
+        self.rejected[self.field_name] = message
+        raise SkipFile(message)
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None):
+        self.field_name = field_name
+        if self.content_types and content_type not in self.content_types:
+            self.reject(ugettext('Files of type %s are not accepted.') %
+                        content_type)
+        if self.max_size and content_length and \
+                content_length > self.max_size:
+            self.reject(self.too_large_message())
+        super(AttachmentUploadHandler, self).new_file(
+            field_name, file_name, content_type, content_length, charset)
+        self.hasher = sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.max_size and self.received > self.max_size:
+            # Closing the temporary file also deletes it.
+            self.file.close()
+            self.reject(self.too_large_message())
+        self.hasher.update(raw_data)
+        return super(AttachmentUploadHandler, self).receive_data_chunk(
+            raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super(AttachmentUploadHandler, self).file_complete(file_size)
+        upload.content_hash = self.hasher.hexdigest()
+        return upload
+
+    def too_large_message(self):
+        return ugettext('The file is larger than %s.') % filesizeformat(
+            self.max_size)
+
+
+def uploaded_files(request):
+    """Return ``request.FILES`` with the rejected uploads attached
+
+    The rejections are stored in the ``rejected`` attribute of the
+    returned dictionary, where the attachment forms look for them.
+    """
+    files = request.FILES
+    files.rejected = getattr(request, 'rejected_uploads', {})
+    return files
@@ -0,0 +1,27 @@
+def queryset_chunks(queryset, chunk_size=1000):
+    """
+    Yield the objects of a queryset in primary key order as lists of at
+    most ``chunk_size`` objects, fetching each list with a query of its
+    own.  Unlike ``queryset.iterator()``, this keeps memory use constant
+    even with database drivers which load whole result sets on the
+    client.
+    """
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+def iterate_in_chunks(queryset, chunk_size=1000):
+    """
+    Iterate over the objects of a queryset, fetching ``chunk_size`` rows
+    per query (see :func:`queryset_chunks`).
+    """
+    for chunk in queryset_chunks(queryset, chunk_size):
+        for obj in chunk:
+            yield obj
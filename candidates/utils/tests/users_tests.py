@@ -3,7 +3,9 @@
 from nose.tools import eq_, assert_true, assert_false
 
 from candidates.utils.users import (
-    noncombining, remove_diacritics, slugify, usernameize, generate_username)
+    noncombining, remove_diacritics, slugify, usernameize, generate_username,
+    username_prefix, allocate_username, normalize_name, applicant_key,
+    generate_usernames)
 
 def test_noncombining():
     from unicodedata import normalize
@@ -32,3 +34,44 @@ def test_generate_username():
             round_name,
             4),
         'erkkiainomaijamartanumme2009_4')
+
+def test_username_prefix():
+    eq_(username_prefix('Bo', 'Ek', '2009'), 'boek2009')
+    prefix = username_prefix(
+        u'Erkki-Aino-Maija-M\xe4rta',
+        u'Nummelan-Pusulan-\xc4rj\xe4v\xf6isen-Sepp\xe4l\xe4',
+        '2009')
+    eq_(prefix, 'erkkiainomaijamartanu')
+    assert_true(generate_username(
+            u'Erkki-Aino-Maija-M\xe4rta',
+            u'Nummelan-Pusulan-\xc4rj\xe4v\xf6isen-Sepp\xe4l\xe4',
+            '2009', 123).startswith(prefix))
+
+def test_allocate_username():
+    eq_(allocate_username('Bo', 'Ek', '2009', set()), 'boek2009')
+    eq_(allocate_username('Bo', 'Ek', '2009', set(['boek2009'])),
+        'boek2009_2')
+    eq_(allocate_username('Bo', 'Ek', '2009',
+                          set(['boek2009', 'boek2009_2', 'boek2009_4'])),
+        'boek2009_3')
+
+def test_normalize_name():
+    eq_(normalize_name(u'  M\xe4rta   Liisa '), u'marta liisa')
+    eq_(normalize_name('J\xc3\xa4rvinen'), u'jarvinen')
+    eq_(normalize_name(None), u'')
+
+def test_applicant_key():
+    eq_(applicant_key(u'M\xe4rta', 'Ek ', 'Marta@Example.COM', '2009'),
+        u'2009|ek|marta|marta@example.com')
+
+def test_remove_diacritics_outside_bmp():
+    eq_(remove_diacritics(u'a\U0001d165b'), u'ab')
+
+def test_generate_usernames():
+    names = [('Bo', 'Ek'), (u'M\xe4rta', 'Ek'), ('Bo', 'Ek')]
+    eq_(generate_usernames(names, '2009'),
+        ['boek2009', 'martaek2009', 'boek2009'])
+    taken = set(['boek2009'])
+    eq_(generate_usernames(names, '2009', taken),
+        ['boek2009_2', 'martaek2009', 'boek2009_3'])
+    eq_(taken, set(['boek2009', 'boek2009_2', 'martaek2009', 'boek2009_3']))
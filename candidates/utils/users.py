@@ -1,7 +1,10 @@
 import re
+from os.path import commonprefix
 
 from unicodedata import combining, normalize
 
+NONWORD_RE = re.compile(r'\W')
+
 def noncombining(u):
     return not combining(u)
 
@@ -15,10 +18,33 @@ def remove_diacritics(s, encoding='UTF-8'):
 def slugify(s):
     return remove_diacritics(s.lower())
 
+def bounded_cache(maxsize):
+    """
+    Memoize a function of one argument which never returns ``None``.
+    The cache is emptied when it grows to ``maxsize`` entries.
+    """
+    def decorator(func):
+        cache = {}
+        def wrapper(arg):
+            result = cache.get(arg)
+            if result is None:
+                if len(cache) >= maxsize:
+                    cache.clear()
+                result = cache[arg] = func(arg)
+            return result
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+@bounded_cache(10000)
 def usernameize(s):
     """
+    Convert a name into lowercase ASCII letters and digits for use in a
+    username.  Results are cached, since names repeat a lot.
     """
-    return re.sub(r'\W', '', slugify(s))
+    return NONWORD_RE.sub('', slugify(s))
 
 def generate_username(first_name, last_name, round_name, n=None):
     """
@@ -34,3 +60,69 @@ def generate_username(first_name, last_name, round_name, n=None):
     name = ('%s%s' % (usernameize(first_name),
                       usernameize(last_name)))[:max_name_len]
     return '%s%s%s' % (name, round_name, suffix)
+
+def username_prefix(first_name, last_name, round_name, max_n=9999):
+    """
+    Return a prefix shared by all usernames :func:`generate_username`
+    produces for the given names with counters up to ``max_n``.  Fetching
+    the usernames starting with this prefix finds all possible collisions
+    in one query.
+    """
+    return commonprefix([
+            generate_username(first_name, last_name, round_name),
+            generate_username(first_name, last_name, round_name, max_n)])
+
+def allocate_username(first_name, last_name, round_name, taken):
+    """
+    Return the first username generated for the given names which isn't
+    included in the ``taken`` collection of existing usernames.
+    """
+    n = None
+    while True:
+        username = generate_username(first_name, last_name, round_name, n)
+        if username not in taken:
+            return username
+        if n is None:
+            n = 2
+        else:
+            n += 1
+
+def normalize_name(s, encoding='UTF-8'):
+    """
+    Normalize a name or an e-mail address for duplicate detection:
+    remove diacritics, surrounding and repeated whitespace and case
+    differences.
+    """
+    if s is None:
+        return u''
+    if not isinstance(s, unicode):
+        s = s.decode(encoding)
+    return u' '.join(remove_diacritics(s).lower().split())
+
+def applicant_key(first_name, last_name, email, round_name):
+    """
+    Return a key which identifies an applicant on a round.  The round
+    name is included so that a single indexed column can be used for
+    looking up duplicate applications on the current round.
+    """
+    return u'|'.join([normalize_name(round_name),
+                      normalize_name(last_name),
+                      normalize_name(first_name),
+                      normalize_name(email)])
+
+def generate_usernames(names, round_name, taken=None):
+    """
+    Generate usernames for a list of ``(first_name, last_name)`` pairs.
+    If a collection of ``taken`` usernames is given, each username is
+    made unique with a counter and added to it.
+    """
+    usernames = []
+    for first_name, last_name in names:
+        if taken is None:
+            username = generate_username(first_name, last_name, round_name)
+        else:
+            username = allocate_username(first_name, last_name, round_name,
+                                         taken)
+            taken.add(username)
+        usernames.append(username)
+    return usernames
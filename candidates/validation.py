@@ -0,0 +1,90 @@
+"""Validation of the nested form structures used by the application views
+
+Views may combine forms, formsets and (nested) lists of them.  The
+:class:`FormValidator` flattens the structure once, validates the forms
+in order, collects their errors and measures the time each form takes.
+"""
+
+import logging
+from time import time as clock
+
+from django.utils.datastructures import SortedDict
+
+
+def flatten_forms(forms):
+    """Return ``(name, form)`` pairs for a dictionary or list of forms
+
+    Anything with an ``is_valid`` method (a form or a formset) is a leaf.
+    Other items are iterated over and their forms are named after the
+    position in the parent, e.g. ``attachments.0``.
+    """
+    if hasattr(forms, 'items'):
+        stack = list(forms.items())
+    else:
+        stack = [(str(i), item) for i, item in enumerate(forms)]
+    stack.reverse()
+    result = []
+    while stack:
+        name, item = stack.pop()
+        if callable(getattr(item, 'is_valid', None)):
+            result.append((name, item))
+        else:
+            children = [('%s.%d' % (name, i), child)
+                        for i, child in enumerate(item)]
+            children.reverse()
+            stack.extend(children)
+    return result
+
+
+class FormValidator(object):
+    """Validate a dictionary or a nested list of forms
+
+    With ``stop_early``, validation stops at the first invalid form.
+    Otherwise all forms are validated, except that forms with a true
+    ``expensive_validation`` attribute (e.g. ones scanning uploaded
+    files) are skipped once some form has turned out invalid.
+
+    After :meth:`validate`, :attr:`errors` maps the names of invalid
+    forms to their errors, :attr:`skipped` lists the names of forms which
+    weren't validated and :attr:`timings` holds ``(name, seconds)`` pairs
+    in validation order.
+    """
+    def __init__(self, forms, stop_early=False):
+        self.forms = flatten_forms(forms)
+        self.stop_early = stop_early
+        self.errors = SortedDict()
+        self.skipped = []
+        self.timings = []
+        self.valid = None
+
+    def validate(self):
+        valid = True
+        for name, form in self.forms:
+            if not valid and (self.stop_early or
+                              getattr(form, 'expensive_validation', False)):
+                self.skipped.append(name)
+                continue
+            started = clock()
+            form_valid = form.is_valid()
+            self.timings.append((name, clock() - started))
+            if not form_valid:
+                valid = False
+                errors = form_errors(form)
+                if errors:
+                    self.errors[name] = errors
+        self.valid = valid
+        logging.debug('Validated forms: %s', ', '.join(
+                '%s %.1f ms' % (name, 1000 * seconds)
+                for name, seconds in self.timings))
+        return valid
+
+
+def form_errors(form):
+    """Return the errors of a form or a formset, or an empty value"""
+    errors = form.errors
+    if callable(getattr(form, 'non_form_errors', None)):
+        non_form_errors = form.non_form_errors()
+        if any(errors) or non_form_errors:
+            return {'forms': errors, 'non_form_errors': non_form_errors}
+        return None
+    return errors
@@ -1,35 +1,97 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
+from functools import wraps
 from random import seed, choice
-from datetime import datetime
-
-from django.db import transaction
-from django.http import HttpResponseRedirect
+from time import time as clock
+from datetime import datetime, time, timedelta
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseRedirect, \
+    HttpResponseForbidden, Http404
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
-from django.shortcuts import get_object_or_404
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404, render_to_response
+from django.template import Context, RequestContext
 from django.utils.cache import add_never_cache_headers
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.template.loader import render_to_string
 from django.core.urlresolvers import reverse
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
 from django.utils.datastructures import SortedDict
+from django.utils.translation import get_language
 
 from classyviews import ClassyView
 
-from candidates.forms import UserForm
-from candidates.utils.users import generate_username
+from candidates.admission import AdmissionController
+from candidates.export import FORMATS, export_columns, export_lines, \
+    export_queryset
+from candidates.forms import UserForm, lazy_forms
+from candidates.instrumentation import instrumented, timed
+from candidates.outbox import queue_email
+from candidates.roles import APPLICANT, REVIEWER, SECRETARY, cached_role
+from candidates.search import get_search_backend
+from candidates.uploads import uploaded_files
+from candidates.utils.users import username_prefix, allocate_username
+from candidates.validation import FormValidator
+
+from pytz import timezone, utc
+
+
+CSRF_TOKEN_PLACEHOLDER = 'CANDIDATESCSRFTOKENPLACEHOLDER'
+
+_round_memo = threading.local()
+_round_cache = {}
+_timezones = {}
+_deadline_cutoffs = {}
+_admission_controllers = {}
 
-from pytz import timezone
+
+def memoize_round(func):
+    """Memoize the round hooks of meta classes during a call to ``func``
+
+    While the decorated function runs, :meth:`MetaBase.resolve_round_name`
+    and :meth:`MetaBase.resolve_deadline` call the underlying hooks at
+    most once per meta class.  Nested calls share the same memo.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_round_memo, 'values', None) is not None:
+            return func(*args, **kwargs)
+        _round_memo.values = {}
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _round_memo.values = None
+    return wrapper
 
 
 class MetaBase:
+    """Meta information for the views of a project
+
+    Subclasses must define :meth:`current_round_name` and
+    :meth:`get_deadline`.  The views call them through
+    :meth:`resolve_round_name` and :meth:`resolve_deadline`, which
+    memoize the values for the duration of a request.  If the hooks are
+    expensive (e.g. they query a rounds table), set
+    :attr:`round_cache_timeout` to also cache the values in the process
+    for that many seconds, and call :meth:`invalidate_round_cache` when
+    the round changes.
+    """
     application_form_view_name = 'application-form'
     edit_application_view_name = 'edit-application'
     login_view_name = 'login'
     prefilled_login_view_name = 'applicant-login'
+    round_cache_timeout = None
 
     @classmethod
     def current_round_name(cls):
@@ -42,6 +104,73 @@ class MetaBase:
             'Define the get_deadline static method in the overridden meta '
             'class of views inherited from django-candidates')
 
+    @classmethod
+    def resolve_round_name(cls):
+        return cls._resolve('current_round_name')
+
+    @classmethod
+    def resolve_deadline(cls):
+        return cls._resolve('get_deadline')
+
+    @classmethod
+    def _resolve(cls, hook):
+        key = (cls, hook)
+        memo = getattr(_round_memo, 'values', None)
+        if memo is not None and key in memo:
+            return memo[key]
+        if cls.round_cache_timeout:
+            now = clock()
+            expires, value = _round_cache.get(key, (0, None))
+            if expires <= now:
+                value = getattr(cls, hook)()
+                _round_cache[key] = (now + cls.round_cache_timeout, value)
+        else:
+            value = getattr(cls, hook)()
+        if memo is not None:
+            memo[key] = value
+        return value
+
+    @classmethod
+    def invalidate_round_cache(cls):
+        """Forget cached round names and deadlines of this meta class
+
+        Subclasses are included, so ``MetaBase.invalidate_round_cache()``
+        clears everything.  Only the cache of the current process is
+        affected; other processes pick up the change when their cached
+        values expire.
+        """
+        memo = getattr(_round_memo, 'values', None) or {}
+        for cache in _round_cache, memo:
+            for key in list(cache):
+                if issubclass(key[0], cls):
+                    del cache[key]
+
+    @classmethod
+    def get_role(cls, request):
+        """Return the role of the current user for the applications
+
+        The role is one of :data:`candidates.roles.APPLICANT`,
+        :data:`~candidates.roles.REVIEWER` (has the view permission) and
+        :data:`~candidates.roles.SECRETARY` (has the change permission).
+        It is cached in the session until permissions change, so
+        anonymous visitors and applicants don't load permissions on
+        every request.
+        """
+        opts = cls.model._meta
+        return cached_role(request,
+                           '%s.%s' % (opts.app_label, opts.module_name),
+                           cls.compute_role)
+
+    @classmethod
+    def compute_role(cls, user):
+        app_label = cls.model._meta.app_label
+        if user.has_perm('%s.%s' % (
+                app_label, cls.model._meta.get_change_permission())):
+            return SECRETARY
+        if user.has_perm('%s.%s' % (app_label, cls.get_view_permission())):
+            return REVIEWER
+        return APPLICANT
+
     @classmethod
     def get_view_permission(cls):
         try:
@@ -58,6 +187,13 @@ class MetaBase:
             'meta class of views inherited from django-candidates')
 
 
+def json_response(data, status=200):
+    response = HttpResponse(json.dumps(data), mimetype='application/json',
+                            status=status)
+    add_never_cache_headers(response)
+    return response
+
+
 class ApplicationViewBase(ClassyView):
     meta = MetaBase
 
@@ -79,25 +215,163 @@ class EditApplicationBase(ApplicationViewBase):
 
     * :attr:`meta`: the class for additional meta information (see
       :class:`MetaBase`)
+
+    After a successful save, the unbound forms shown to the user are
+    only created when the template first uses them.  Set
+    :attr:`lazy_forms_after_save` to ``False`` to create them right away.
+
+    The forms are validated with :class:`candidates.validation.FormValidator`.
+    Set :attr:`stop_validation_early` to stop at the first invalid form.
+
+    Set :attr:`anonymous_form_cache_timeout` to cache the blank public
+    form shown to anonymous visitors for that many seconds.  The cache
+    isn't invalidated when templates change.  The cached form is
+    rendered without context processors (see
+    :meth:`cached_anonymous_form`).
+
+    Set :attr:`queue_confirmation_email` to store confirmation e-mails
+    in the outbox instead of sending them during the request.  The
+    ``send_queued_email`` management command must then be run to
+    deliver them.
+
+    Set :attr:`admission_limit` to limit the number of POSTs handled at
+    once in each process.  A POST waits at most :attr:`admission_timeout`
+    seconds for its turn.  :attr:`admission_shared_limit` limits the
+    total across all processes with a counter in the cache.  Rejected
+    POSTs get the form back with the submitted data and ``busy`` set in
+    the context.  See :mod:`candidates.admission`.
+
+    Logged in applicants can save their progress by POSTing only the
+    changed fields of one form with an ``autosave`` parameter naming the
+    form prefix.  Only prefixes in :attr:`autosave_prefixes` are
+    accepted.  See :meth:`autosave`.
     """
     template_name = 'candidates/application_form.html'
     confirmation_request_template_name = (
         'candidates/confirmation_request_email.txt')
     confirmation_request_subject = 'Please confirm your application'
+    queue_confirmation_email = False
+    anonymous_form_cache_timeout = None
+    username_allocation_attempts = 5
+    lazy_forms_after_save = True
+    stop_validation_early = False
+    autosave_prefixes = ('application',)
+    admission_limit = None
+    admission_timeout = 2.0
+    admission_shared_limit = None
+    admission_retry_after = 10
     timezone = "US/Hawaii"
 
     @classmethod
     def GET(cls, request, username=''):
+        if (cls.anonymous_form_cache_timeout and username == '' and
+            not request.user.is_authenticated()):
+            return cls.cached_anonymous_form(request)
         return cls.handle_request(request,
                                   None, None, username)
 
+    @classmethod
+    @memoize_round
+    def cached_anonymous_form(cls, request):
+        """Serve the blank public form to an anonymous visitor from the cache
+
+        The page is rendered once per round, language and deadline state
+        with a placeholder instead of the CSRF token.  It's rendered with
+        a plain :class:`Context`, since the values of context processors
+        (e.g. messages) belong to the first visitor only.  The template
+        must not depend on them.  :meth:`personalize_anonymous_form`
+        fills in the parts specific to each visitor when the page is
+        served.
+        """
+        key = cls.anonymous_form_cache_key(request)
+        html = cache.get(key)
+        if html is None:
+            context = cls.handle_request(request, None, None, '')
+            if not isinstance(context, dict):
+                return context
+            html = render_to_string(
+                cls.template_name, context,
+                context_instance=Context(
+                    {'csrf_token': CSRF_TOKEN_PLACEHOLDER}))
+            cache.set(key, html, cls.anonymous_form_cache_timeout)
+        response = HttpResponse(cls.personalize_anonymous_form(request, html))
+        add_never_cache_headers(response)
+        return response
+
+    @classmethod
+    def personalize_anonymous_form(cls, request, html):
+        """Fill in the parts of the cached form specific to the visitor
+
+        Substitutes the CSRF token of the visitor for the placeholder.
+        Subclasses can extend this to add other request-specific parts.
+        """
+        return html.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request))
+
+    @classmethod
+    def anonymous_form_cache_key(cls, request):
+        return 'candidates:anonymous-form:%s.%s:%s:%s:%d' % (
+            cls.__module__, cls.__name__,
+            cls.meta.resolve_round_name(),
+            get_language(),
+            cls.is_past_deadline())
+
     @classmethod
     @transaction.commit_on_success
     def POST(cls, request, username=''):
-        return cls.handle_request(request,
-                                  request.POST, request.FILES, username)
+        if 'autosave' in request.POST:
+            return cls.autosave(request, request.POST['autosave'],
+                                request.POST)
+        controller = cls.admission_controller()
+        if controller is None:
+            return cls.handle_request(request,
+                                      request.POST, uploaded_files(request),
+                                      username)
+        if not controller.acquire():
+            return cls.busy_context(request.POST, uploaded_files(request))
+        try:
+            return cls.handle_request(request,
+                                      request.POST, uploaded_files(request),
+                                      username)
+        finally:
+            controller.release()
+
+    @classmethod
+    def admission_controller(cls):
+        """Return the admission controller of the view, if enabled"""
+        if not cls.admission_limit:
+            return None
+        try:
+            return _admission_controllers[cls]
+        except KeyError:
+            return _admission_controllers.setdefault(cls, AdmissionController(
+                    '%s.%s' % (cls.__module__, cls.__name__),
+                    cls.admission_limit,
+                    cls.admission_timeout, cls.admission_shared_limit))
+
+    @classmethod
+    @memoize_round
+    def busy_context(cls, data, files):
+        """Return the context for asking the user to submit again later
+
+        The forms are bound to the submitted data so the user doesn't
+        need to fill them in again.  Uploaded files must be chosen
+        again.
+        """
+        forms = cls.create_forms(data, files, None, cls.meta.model())
+        return dict(
+            forms=forms.values(),
+            busy=True,
+            retry_after=cls.admission_retry_after,
+            saved=False,
+            has_errors=False,
+            should_confirm=False,
+            deadline=cls.meta.resolve_deadline(),
+            deadline_cutoff=cls.deadline_cutoff(),
+            **forms)
 
     @classmethod
+    @instrumented('edit_application')
+    @memoize_round
     def handle_request(cls, request, data, files, username):
         """Handle HTTP requests for creating and editing applications
 
@@ -138,16 +412,14 @@ class EditApplicationBase(ApplicationViewBase):
             username = ''
 
         public_interface = username == ''
-        secretary = request.user.has_perm('%s.%s' % (
-                cls.meta.model._meta.app_label,
-                cls.meta.model._meta.get_change_permission()))
+        secretary = timed('permission',
+                          cls.meta.get_role, request) == SECRETARY
 
         if not secretary:
             if not public_interface:
                 return cls.redirect_to_login('')
-            today = datetime.now(tz=timezone(cls.timezone)).date()
-            if today > cls.meta.get_deadline():
-                return {'past_deadline': True}
+            if timed('deadline', cls.is_past_deadline):
+                return cls.past_deadline_context()
 
         user = None
         app = None
@@ -169,7 +441,7 @@ class EditApplicationBase(ApplicationViewBase):
             try:
                 app = cls.meta.model.objects.get(
                     user=user,
-                    round_name=cls.meta.current_round_name())
+                    round_name=cls.meta.resolve_round_name())
                 saved = True
             except cls.meta.model.DoesNotExist:
                 logout(request)
@@ -180,34 +452,36 @@ class EditApplicationBase(ApplicationViewBase):
             if user is not None:
                 app.user = user
 
-        forms = cls.create_forms(data, files, user, app)
+        forms = timed('forms', cls.create_forms, data, files, user, app)
 
-        def all_valid_recursive(form_seq):
-            """Validate forms in a nested list structure"""
-            valid = True
-            for item in form_seq:
-                if callable(getattr(item, 'is_valid', None)):
-                    if not item.is_valid():
-                        valid = False
-                elif not all_valid_recursive(item):
-                    valid = False
-            return valid
-
-        all_forms_valid = all_valid_recursive(forms.values())
+        validator = FormValidator(forms, stop_early=cls.stop_validation_early)
+        if data is None:
+            # Unbound forms are never valid
+            all_forms_valid = False
+        else:
+            all_forms_valid = timed('validation', validator.validate)
         if all_forms_valid:
             # The application is valid and should be saved.
             user = forms['user_form'].save(commit=False)
+            password = None
+            if user.pk is None and not secretary:
+                # Hash the password of a new applicant before the user
+                # is saved for the first time.
+                password = cls.generate_password()
+                user.set_password(password)
             other_forms = dict((k, v) for k, v in forms.items()
                                if k != 'user_form')
             username, application = cls.save(
                 user, is_secretary=secretary, **other_forms)
             saved = True
             if application.send_confirmation_email:
-                user, password = cls.assign_password(username)
-                cls.send_confirmation_email(request, application, password)
-                user = authenticate(username=username, password=password)
-            else:
-                user.backend = settings.AUTHENTICATION_BACKENDS[0]
+                if password is None:
+                    password = cls.set_new_password(user)
+                timed('email', cls.send_confirmation_email,
+                      request, application, password)
+            # The password has just been set, so there's no need to check
+            # it again with authenticate().
+            user.backend = settings.AUTHENTICATION_BACKENDS[0]
             if secretary:
                 # If the secretary saved a new valid application, show a link
                 # for editing it in the private interface. We can't do a HTTP
@@ -220,21 +494,177 @@ class EditApplicationBase(ApplicationViewBase):
                 # A visitor saved a valid application. Log in as the user of
                 # the application.
                 login(request, user)
-            forms = cls.create_forms(None, None, user, app)
+            app = application
+            if cls.lazy_forms_after_save:
+                # Templates which don't render the forms after a
+                # successful save never pay for creating them again.
+                forms = lazy_forms(
+                    lambda: cls.create_forms(None, None, user, app),
+                    forms.keys())
+            else:
+                forms = cls.create_forms(None, None, user, app)
         should_confirm = False
         if user:
-            app = user.applications.get(
-                round_name=cls.meta.current_round_name())
-            should_confirm = \
-                not app.send_confirmation_email and not app.confirmed
+            should_confirm = not app.confirmed and (
+                cls.queue_confirmation_email or
+                not app.send_confirmation_email)
         return dict(
             forms=forms.values(),
             saved=saved,
             has_errors=data is not None and not all_forms_valid,
             should_confirm=should_confirm,
-            deadline=cls.meta.get_deadline(),
+            deadline=cls.meta.resolve_deadline(),
+            deadline_cutoff=cls.deadline_cutoff(),
+            form_errors=validator.errors,
+            validation_timings=validator.timings,
             **forms)
 
+    @classmethod
+    @instrumented('autosave')
+    @memoize_round
+    def autosave(cls, request, prefix, data):
+        """Save the submitted fields of one form of an existing application
+
+        Only the fields present in the POST data are validated, and only
+        their columns, the derived columns and ``date_updated`` are
+        written with ``update()``.  File fields are ignored.  The
+        response is a JSON object with ``saved`` set to ``true`` and the
+        list of saved ``fields``, or ``false`` and the ``errors``.
+        """
+        if prefix not in cls.autosave_prefixes:
+            return json_response({'saved': False,
+                                  'error': 'unknown form'}, status=400)
+        if not request.user.is_authenticated():
+            return json_response({'saved': False,
+                                  'error': 'not logged in'}, status=403)
+        if cls.is_past_deadline():
+            return json_response({'saved': False,
+                                  'error': 'deadline passed'}, status=403)
+        try:
+            application = cls.meta.model._default_manager.select_related(
+                'user').get(user=request.user,
+                            round_name=cls.meta.resolve_round_name())
+        except cls.meta.model.DoesNotExist:
+            return json_response({'saved': False,
+                                  'error': 'no application'}, status=404)
+
+        form = cls.create_autosave_form(prefix, data, application)
+        submitted = set(key[len(prefix) + 1:] for key in data
+                        if key.startswith(prefix + '-'))
+        instance = form.instance
+        columns = dict((field.name, field)
+                       for field in instance._meta.fields
+                       if field.editable and
+                       not isinstance(field, models.FileField))
+        for name in form.fields.keys():
+            if name not in submitted or name not in columns:
+                del form.fields[name]
+        if not form.fields:
+            return json_response({'saved': True, 'fields': []})
+        if not timed('validation', form.is_valid):
+            return json_response({
+                    'saved': False,
+                    'errors': dict((name, [unicode(e) for e in errors])
+                                   for name, errors in form.errors.items())})
+
+        timed('save_application', cls.save_autosave_form,
+              form, application)
+        return json_response({'saved': True,
+                              'fields': sorted(form.fields.keys())})
+
+    @classmethod
+    def create_autosave_form(cls, prefix, data, application):
+        """Create the form for the ``prefix`` of an autosave request
+
+        The user form and the application form are supported.  Override
+        this for other prefixes in :attr:`autosave_prefixes`.
+        """
+        if prefix == 'user':
+            return cls.create_user_form(data, instance=application.user,
+                                        prefix=prefix)
+        if prefix == 'application':
+            return cls.create_application_form(data, instance=application,
+                                               prefix=prefix)
+        raise ValueError('No autosave form for prefix %r' % prefix)
+
+    @classmethod
+    def save_autosave_form(cls, form, application):
+        """Write the validated fields of an autosave form with update()
+
+        The applicant key and the search document of the application
+        are updated if the saved fields change them.
+        """
+        instance = form.instance
+        values = dict((name, form.cleaned_data[name]) for name in form.fields)
+        for name, value in values.items():
+            setattr(instance, name, value)
+        if instance is not application:
+            type(instance)._default_manager.filter(pk=instance.pk).update(
+                **values)
+            values = {}
+        derived = (application.applicant_key, application.search_document)
+        application.prepare_save()
+        if (application.applicant_key,
+            application.search_document) != derived:
+            values.update(applicant_key=application.applicant_key,
+                          search_document=application.search_document)
+        application.date_updated = values['date_updated'] = datetime.now()
+        cls.meta.model._default_manager.filter(pk=application.pk).update(
+            **values)
+
+    @classmethod
+    def get_timezone(cls):
+        """Return the pytz time zone object for :attr:`timezone`"""
+        try:
+            return _timezones[cls.timezone]
+        except KeyError:
+            zone = _timezones[cls.timezone] = timezone(cls.timezone)
+            return zone
+
+    @classmethod
+    def deadline_cutoff(cls):
+        """Return the UTC instant when the deadline day ends
+
+        The deadline day ends at midnight in :attr:`timezone`.  The
+        result is computed once per time zone and deadline.
+        """
+        deadline = cls.meta.resolve_deadline()
+        key = cls.timezone, deadline
+        try:
+            return _deadline_cutoffs[key]
+        except KeyError:
+            pass
+        end_of_day = cls.get_timezone().localize(
+            datetime.combine(deadline + timedelta(1), time()))
+        cutoff = _deadline_cutoffs[key] = end_of_day.astimezone(utc)
+        return cutoff
+
+    @classmethod
+    def is_past_deadline(cls, now=None):
+        """Check whether the deadline has passed at the ``now`` UTC instant"""
+        if now is None:
+            now = datetime.utcnow().replace(tzinfo=utc)
+        return now >= cls.deadline_cutoff()
+
+    @classmethod
+    def past_deadline_context(cls):
+        return {'past_deadline': True,
+                'deadline': cls.meta.resolve_deadline(),
+                'deadline_cutoff': cls.deadline_cutoff()}
+
+    @classmethod
+    def past_deadline_response(cls, request):
+        """Render the template for a request arriving after the deadline
+
+        Used by :class:`candidates.middleware.DeadlineMiddleware` to
+        answer without running the view.
+        """
+        response = render_to_response(
+            cls.template_name, cls.past_deadline_context(),
+            context_instance=RequestContext(request))
+        add_never_cache_headers(response)
+        return response
+
     @classmethod
     def create_forms(cls, data, files, user, appl):
         """
@@ -261,7 +691,8 @@ class EditApplicationBase(ApplicationViewBase):
     @classmethod
     def create_user_form(cls, data, instance, prefix):
         return UserForm(data=data, instance=instance, prefix=prefix,
-                        current_round_name=cls.meta.current_round_name())
+                        current_round_name=cls.meta.resolve_round_name(),
+                        application_model=cls.meta.model)
 
     @classmethod
     def create_application_form(cls, data, instance, prefix):
@@ -286,9 +717,9 @@ class EditApplicationBase(ApplicationViewBase):
 
     @classmethod
     def save(cls, user, is_secretary=None, **forms):
-        user = cls.save_user(user)
-        application = cls.save_application(
-            forms['application_form'], user, is_secretary)
+        user = timed('save_user', cls.save_user, user)
+        application = timed('save_application', cls.save_application,
+                            forms['application_form'], user, is_secretary)
         other_forms = dict((k, v) for k, v in forms.items()
                            if k != 'application_form')
         cls.save_extra_forms(user, application, **other_forms)
@@ -296,31 +727,57 @@ class EditApplicationBase(ApplicationViewBase):
 
     @classmethod
     def save_user(cls, user):
-        if not user.pk:
+        user.last_login = datetime.now()
+        pk = user.pk
+        if pk:
+            user.save()
+        else:
             # This is a new application, user will be saved for the first time.
             user.date_joined = datetime.now()
             user.is_active = True
-            user.username = generate_username(
-                user.first_name, user.last_name,
-                cls.meta.current_round_name())
-            n = 2
-            while User.objects.filter(username=user.username):
-                user.username = generate_username(
-                    user.first_name, user.last_name,
-                    cls.meta.current_round_name(), n)
-                n += 1
-        user.last_login = datetime.now()
-        pk = user.pk
-        user.save()
+            cls.save_new_user(user)
         logging.debug('Saved user %r as %r', pk, user.pk)
         return user
 
+    @classmethod
+    def save_new_user(cls, user):
+        """Allocate a unique username for a new user and save it
+
+        All existing usernames which could collide with the generated
+        one are fetched in a single query.  If another request grabs
+        the same username before the user is inserted, the insert is
+        retried with the next free username.
+        """
+        round_name = cls.meta.resolve_round_name()
+        prefix = username_prefix(user.first_name, user.last_name, round_name)
+        taken = set()
+        for attempt in range(cls.username_allocation_attempts):
+            taken.update(User.objects.filter(
+                    username__startswith=prefix).values_list(
+                    'username', flat=True))
+            user.username = allocate_username(
+                user.first_name, user.last_name, round_name, taken)
+            sid = transaction.savepoint()
+            try:
+                user.save(force_insert=True)
+            except IntegrityError:
+                transaction.savepoint_rollback(sid)
+                logging.debug('Username %r was taken, retrying',
+                              user.username)
+                taken.add(user.username)
+                user.pk = None
+                continue
+            transaction.savepoint_commit(sid)
+            return user
+        raise IntegrityError('Could not allocate a username for %s %s' %
+                             (user.first_name, user.last_name))
+
     @classmethod
     def save_application(cls,
                          application_form, user, is_secretary, commit=True):
         application = application_form.save(commit=False)
         application.user = user
-        application.round_name = cls.meta.current_round_name()
+        application.round_name = cls.meta.resolve_round_name()
         if is_secretary:
             application.confirmed = True
             application.send_confirmation_email = False
@@ -328,10 +785,24 @@ class EditApplicationBase(ApplicationViewBase):
         if commit:
             application.save()
             logging.debug('Saved application %r as %r', pk, application.pk)
-            return cls.meta.model.objects.get(pk=application.pk)
+            return cls.refresh_application(application)
         else:
             return application
 
+    @classmethod
+    def refresh_application(cls, application):
+        """Return the application instance to use after saving it
+
+        The saved instance is used as such by default.  Subclasses whose
+        models have values computed by the database (e.g. defaults or
+        triggers) can override this to re-fetch the application::
+
+            @classmethod
+            def refresh_application(cls, application):
+                return cls.meta.model.objects.get(pk=application.pk)
+        """
+        return application
+
     @classmethod
     def save_extra_forms(cls, user, application):
         """Save extra forms besides the user and application forms
@@ -343,31 +814,63 @@ class EditApplicationBase(ApplicationViewBase):
         pass
 
     @staticmethod
-    def assign_password(username):
+    def generate_password():
         common = '23456789abcdefghijkmnpqrstuvwxyz'
         rare = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
         alphabet = 3 * common + rare
         seed()
-        password = ''.join(choice(alphabet) for x in range(8))
-        logging.debug(
-            '********** setting password for %r to %r', username, password)
-        user = User.objects.get(username=username)
+        return ''.join(choice(alphabet) for x in range(8))
+
+    @classmethod
+    def set_new_password(cls, user):
+        """Generate a new password for a saved user
+
+        Only the password column is written.  Return the plaintext
+        password.
+        """
+        password = cls.generate_password()
         user.set_password(password)
-        pk = user.pk
-        user.save()
-        logging.debug('Saved user %r as %r', pk, user.pk)
-        logging.debug('---------> %r', user.password)
-        return User.objects.get(pk=user.pk), password
+        User.objects.filter(pk=user.pk).update(password=user.password)
+        logging.debug('Set a new password for user %r', user.pk)
+        return password
 
     @classmethod
-    def send_confirmation_email(cls, request, application, password):
-        body = render_to_string(
+    def assign_password(cls, username):
+        """Set a new password for the named user
+
+        Kept for backwards compatibility, use :meth:`set_new_password`
+        with a user instance instead.
+        """
+        user = User.objects.get(username=username)
+        return user, cls.set_new_password(user)
+
+    @classmethod
+    def render_confirmation_email(cls, request, application, password):
+        return render_to_string(
             cls.confirmation_request_template_name,
             {'application': application,
              'password': password,
-             'deadline': cls.meta.get_deadline(),
+             'deadline': cls.meta.resolve_deadline(),
              'request': request,
              'settings': settings})
+
+    @classmethod
+    def send_confirmation_email(cls, request, application, password):
+        """Send or queue the confirmation request e-mail
+
+        If :attr:`queue_confirmation_email` is set, the message is only
+        stored in the outbox and the ``send_confirmation_email`` flag
+        of the application is cleared by the outbox dispatcher once the
+        message has actually been sent.
+        """
+        body = cls.render_confirmation_email(request, application, password)
+        if cls.queue_confirmation_email:
+            queue_email(cls.confirmation_request_subject,
+                        body,
+                        settings.APPLICATION_EMAIL_SENDER,
+                        [application.user.email],
+                        application=application)
+            return
         send_mail(cls.confirmation_request_subject,
                   body,
                   settings.APPLICATION_EMAIL_SENDER,
@@ -390,23 +893,154 @@ class ConfirmApplicationBase(ApplicationViewBase):
         super(ConfirmApplicationBase, self).__init__(*args, **kwargs)
         add_never_cache_headers(self)
 
+    @instrumented('confirm_application')
     def GET(self, request, application_id, confirmation_code):
-        application = get_object_or_404(self.meta.model, pk=application_id)
-        if confirmation_code == application.confirmation_code:
-            application.confirmed = True
-            application.save()
+        model = self.meta.model
+        application = timed(
+            'lookup', get_object_or_404,
+            model._default_manager.only('user', 'confirmation_salt'),
+            pk=application_id)
+        if application.check_confirmation_code(confirmation_code):
+            timed('confirm', model.mark_confirmed, application.pk)
         return HttpResponseRedirect(
             reverse('application-confirmation-result',
                     kwargs={'application_id': application.pk}))
 
 
 class ApplicationListBase(ApplicationViewBase):
+    """Base class for the list of applications on a round
+
+    The list is paginated with a keyset on the sort column and the
+    primary key: the ``after`` GET parameter holds the primary key of
+    the last application on the previous page.  This keeps every page
+    equally fast regardless of its position in the list.  The ``sort``
+    GET parameter selects one of :attr:`sort_fields`, prefixed with
+    ``-`` for descending order.  The sort fields should be indexed.
+
+    Only secretaries and reviewers may see the list.  Others get a 403
+    response.
+
+    Only the application columns in :attr:`list_fields` and the user
+    columns in :attr:`user_fields` are loaded, and the user is joined in
+    the same query.  Subclasses which display other columns must extend
+    these attributes.
+
+    With the ``q`` GET parameter, the applications matching the query
+    are listed in the order of relevance given by the search backend
+    (see :mod:`candidates.search`).  Search results are paginated with
+    the ``page`` GET parameter.
+    """
     template_name = 'candidates/application_list.html'
+    paginate_by = 50
+    list_fields = ('round_name', 'confirmed', 'date_created', 'date_updated')
+    user_fields = ('username', 'first_name', 'last_name', 'email')
+    sort_fields = ('date_created', 'date_updated')
+    default_sort = '-date_created'
 
     def __init__(self, *args, **kwargs):
         super(ApplicationListBase, self).__init__(*args, **kwargs)
         add_never_cache_headers(self)
 
+    def GET(self, request, round):
+        if self.meta.get_role(request) not in (SECRETARY, REVIEWER):
+            return HttpResponseForbidden()
+        query = request.GET.get('q', '').strip()
+        if query:
+            return self.search(request, round, query)
+        sort = request.GET.get('sort', self.default_sort)
+        if sort.lstrip('-') not in self.sort_fields:
+            sort = self.default_sort
+        applications, next_cursor = self.get_page(
+            self.get_queryset(round), sort, request.GET.get('after'))
+        return {'applications': applications,
+                'round_name': round,
+                'sort': sort,
+                'sort_fields': self.sort_fields,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None}
+
+    def search(self, request, round, query):
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+        offset = (page - 1) * self.paginate_by
+        results = get_search_backend().search(self.get_queryset(round), query)
+        applications = list(results[offset:offset + self.paginate_by + 1])
+        has_next = len(applications) > self.paginate_by
+        return {'applications': applications[:self.paginate_by],
+                'round_name': round,
+                'query': query,
+                'page': page,
+                'next_page': has_next and page + 1 or None,
+                'has_next': has_next}
+
+    def get_queryset(self, round_name):
+        fields = list(self.list_fields) + ['user'] + [
+            'user__%s' % field for field in self.user_fields]
+        return self.meta.model._default_manager.filter(
+            round_name=round_name).select_related('user').only(*fields)
+
+    def get_page(self, queryset, sort, after=None):
+        """Return the applications of a page and the cursor for the next
+
+        ``after`` is the primary key of the last application on the
+        previous page.  The returned cursor is ``None`` on the last page.
+        """
+        field = sort.lstrip('-')
+        descending = sort.startswith('-')
+        if descending:
+            ordering = (sort, '-pk')
+            op = 'lt'
+        else:
+            ordering = (sort, 'pk')
+            op = 'gt'
+        if after:
+            try:
+                last_value = queryset.filter(pk=after).values_list(
+                    field, flat=True)[0]
+            except (IndexError, ValueError):
+                pass
+            else:
+                queryset = queryset.filter(
+                    Q(**{'%s__%s' % (field, op): last_value}) |
+                    Q(**{field: last_value, 'pk__%s' % op: after}))
+        applications = list(queryset.order_by(*ordering)[:self.paginate_by + 1])
+        if len(applications) > self.paginate_by:
+            applications = applications[:self.paginate_by]
+            return applications, applications[-1].pk
+        return applications, None
+
+
+class ApplicationExportBase(ApplicationViewBase):
+    """Base class for a streaming export of the applications of a round
+
+    The ``format`` URL argument can be ``csv`` or ``jsonl``.  Rows are
+    sent to the client as they are read from the database, so response
+    middleware which reads the whole content (e.g. GZip or ETag
+    handling) defeats the purpose of this view.
+    """
+    chunk_size = 1000
+
+    def GET(self, request, round, format='csv'):
+        if self.meta.get_role(request) not in (SECRETARY, REVIEWER):
+            return HttpResponseForbidden()
+        if format not in FORMATS:
+            raise Http404
+        model = self.meta.model
+        lines = export_lines(export_queryset(model, round),
+                             self.get_columns(),
+                             format,
+                             self.chunk_size)
+        response = HttpResponse(lines, content_type=FORMATS[format])
+        response['Content-Disposition'] = (
+            'attachment; filename=applications-%s.%s' % (round, format))
+        add_never_cache_headers(response)
+        return response
+
+    def get_columns(self):
+        return export_columns(self.meta.model)
+
 
 class LoginBase(ClassyView):
     template_name = 'candidates/login.html'
@@ -415,16 +1049,18 @@ class LoginBase(ClassyView):
         form = AuthenticationForm(request, initial={'username': username})
         return self.display_form(request, form, username)
 
+    @instrumented('login')
     def POST(self, request, username=None):
         # ``username=None`` here temporarily because people might have the old
         # login form in cache.  The old version POSTed to the
         # ``login-applicant`` view which includes the username in the URL.
         form = AuthenticationForm(data=request.POST)
-        if form.is_valid():
+        if timed('authentication', form.is_valid):
             return self.login(request, form.get_user())
         return self.display_form(request, form, request.POST['username'])
 
     @classmethod
+    @memoize_round
     def login(cls, request, user):
         """
         Log in a user whose password has been checked.  Redirect to the
@@ -437,29 +1073,30 @@ class LoginBase(ClassyView):
         if request.session.test_cookie_worked():
             request.session.delete_test_cookie()
 
-        if user.has_perm('%s.%s' % (
-                        cls.meta.model._meta.app_label,
-                        cls.meta.get_view_permission())):
+        if timed('permission', cls.meta.get_role,
+                 request) in (SECRETARY, REVIEWER):
             # secretary and board members go to the application list
             return HttpResponseRedirect(reverse(
                     'application-list', kwargs={
-                        'round': cls.meta.current_round_name()}))
+                        'round': cls.meta.resolve_round_name()}))
 
         # Confirm application and show it.  Username not in URL,
         # logged in.
         redirect_to = reverse(cls.meta.application_form_view_name)
+        model = cls.meta.model
         try:
-            app = user.applications.get(
-                round_name=cls.meta.current_round_name())
-            if not app.confirmed:
-                app.confirmed = True
-                app.save()
-                redirect_to = reverse(
-                    'application-confirmation-result',
-                    kwargs={'application_id': app.pk})
-        except cls.meta.model.DoesNotExist:
+            app_pk = model._default_manager.filter(
+                user=user,
+                round_name=cls.meta.resolve_round_name()).values_list(
+                'pk', flat=True)[0]
+        except IndexError:
             # no application is found, show an empty application form
             pass
+        else:
+            if timed('confirm', model.mark_confirmed, app_pk):
+                redirect_to = reverse(
+                    'application-confirmation-result',
+                    kwargs={'application_id': app_pk})
         return HttpResponseRedirect(redirect_to)
 
     @classmethod
@@ -474,11 +1111,12 @@ class ApplicationConfirmationResultBase(ClassyView):
     confirmed_template_name = 'candidates/confirmed.html'
     invalid_code_template_name = 'candidates/invalid_confirmation_code.html'
 
+    @memoize_round
     def GET(self, request, application_id):
         application = get_object_or_404(self.meta.model, pk=application_id)
         username = application.user.username
         context = dict(
-            deadline=self.meta.get_deadline(),
+            deadline=self.meta.resolve_deadline(),
             username=username)
         if application.confirmed:
             self.template_name = self.confirmed_template_name
@@ -1,12 +1,10 @@
 from django import forms
-from candidates.forms import autostrip
+from candidates.forms import StripWhitespaceMixin
 from example.candidates_test_app.models import Application
 
 class BaseApplicationForm(forms.ModelForm):
     class Meta:
         model = Application
 
-class ApplicationForm(BaseApplicationForm):
+class ApplicationForm(StripWhitespaceMixin, BaseApplicationForm):
     pass
-
-ApplicationForm = autostrip(ApplicationForm)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the application views of the example project
+
+Run from the ``example`` directory::
+
+    python manage.py benchmark_candidates --applications 10000 -o results.json
+
+A test database is created, filled with a synthetic round of
+applications and destroyed afterwards, so the configured database is
+left untouched.  Applicant names are drawn from short lists, which
+produces the kind of username and name collisions seen on real rounds.
+E-mail goes to the locmem backend.  Views are called without rendering
+templates, so the results measure the library rather than the
+templates of the example project.
+"""
+
+import sys
+from optparse import make_option
+from random import Random
+from timeit import default_timer
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.client import Client
+from django.test.utils import setup_test_environment, \
+    teardown_test_environment
+
+from candidates.importer import bulk_insert
+from candidates.utils.users import generate_usernames
+from candidates_test_app.models import Application
+from candidates_test_app.views import ApplicationMeta, EditApplication, \
+    ConfirmApplication, Login, ApplicationList
+
+PASSWORD = 'benchmark'
+
+FIRST_NAMES = [u'Maria', u'Märta', u'Aino', u'Erkki', u'Jüri', u'Åsa',
+               u'Liisa', u'Jérôme', u'Søren', u'Zoë', u'Łukasz', u'Anna',
+               u'Mikko', u'Juha', u'Timo', u'Sari', u'Päivi', u'Matti']
+LAST_NAMES = [u'Virtanen', u'Järvinen', u"O'Malley-Korhonen", u'Nieminen',
+              u'Mäkinen', u'Seppälä', u'Dvořák', u'Müller', u'Žukauskas',
+              u'Korhonen', u'Hämäläinen', u'Laine', u'Heikkinen',
+              u'Koskinen', u'Lehtonen']
+
+
+class MiddlewareRequestFactory(Client):
+    """Build requests and run the project's request middleware on them
+
+    The views need the session and the user which the middleware adds.
+    ``Client.get()`` and ``Client.post()`` build the WSGI environment and
+    pass it to :meth:`request`, which returns the request instead of
+    handling it.  ``django.test.client.RequestFactory`` would do the
+    same, but it only exists in Django 1.3.
+    """
+    def __init__(self, **defaults):
+        super(MiddlewareRequestFactory, self).__init__(**defaults)
+        self.handler = BaseHandler()
+        self.handler.load_middleware()
+
+    def request(self, **request):
+        environ = {
+            'HTTP_COOKIE': self.cookies,
+            'PATH_INFO': '/',
+            'QUERY_STRING': '',
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': 80,
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+        }
+        environ.update(self.defaults)
+        environ.update(request)
+        request = WSGIRequest(environ)
+        for middleware_method in self.handler._request_middleware:
+            if middleware_method(request):
+                raise CommandError('Request middleware returned a response')
+        return request
+
+
+rf = MiddlewareRequestFactory()
+
+
+def percentile(sorted_values, fraction):
+    index = int(round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def summarize(latencies, queries, total):
+    latencies = sorted(latencies)
+    return {'requests': len(latencies),
+            'seconds': total,
+            'requests_per_second': len(latencies) / total,
+            'latency_ms': dict(
+                (label, 1000 * percentile(latencies, fraction))
+                for label, fraction in [('min', 0), ('median', .5),
+                                        ('p95', .95), ('max', 1)]),
+            'queries': {'mean': float(sum(queries)) / len(queries),
+                        'max': max(queries)}}
+
+
+class Command(BaseCommand):
+    help = ('Fill a test database with a synthetic round of applications '
+            'and measure the latency, query count and throughput of the '
+            'edit, login, confirmation and list views.  Results are '
+            'written as JSON.')
+    option_list = BaseCommand.option_list + (
+        make_option('--applications', type='int', default=10000,
+                    help='Number of applications on the synthetic round'),
+        make_option('--requests', type='int', default=200,
+                    help='Number of requests per scenario'),
+        make_option('--chunk-size', type='int', default=1000,
+                    help='Number of applications to insert per transaction'),
+        make_option('--seed', type='int', default=2010,
+                    help='Seed for generating names and picking applicants'),
+        make_option('--output', '-o',
+                    help='Write the results to this file instead of '
+                         'standard output'),
+        )
+
+    def handle(self, *args, **options):
+        self.random = Random(options['seed'])
+        setup_test_environment()
+        old_debug = settings.DEBUG
+        settings.DEBUG = False
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings.DEBUG = old_debug
+            teardown_test_environment()
+
+        if options['output']:
+            output = open(options['output'], 'w')
+        else:
+            output = sys.stdout
+        try:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write('\n')
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    def run(self, options):
+        self.round_name = ApplicationMeta.resolve_round_name()
+        started = default_timer()
+        self.generate(options['applications'], options['chunk_size'])
+        generation_seconds = default_timer() - started
+        self.sample = self.pick_applications(options['requests'])
+        self.secretary = User.objects.create(username='benchmark-secretary',
+                                             is_superuser=True)
+
+        scenarios = {}
+        for name, scenario in [('edit_get', self.edit_get),
+                               ('edit_post_new', self.edit_post_new),
+                               ('edit_post_existing', self.edit_post_existing),
+                               ('login_post', self.login_post),
+                               ('confirm_get', self.confirm_get),
+                               ('list_get', self.list_get)]:
+            scenarios[name] = self.measure(scenario, options['requests'])
+        return {'django': django.get_version(),
+                'database': connection.settings_dict['ENGINE'],
+                'applications': options['applications'],
+                'seed': options['seed'],
+                'generation_seconds': generation_seconds,
+                'scenarios': scenarios}
+
+    def generate(self, count, chunk_size):
+        user = User()
+        user.set_password(PASSWORD)
+        self.password_hash = user.password
+        self.taken_usernames = set()
+        for start in xrange(0, count, chunk_size):
+            self.insert_chunk(start, min(chunk_size, count - start))
+
+    @transaction.commit_on_success
+    def insert_chunk(self, start, count):
+        names = [(self.random.choice(FIRST_NAMES),
+                  self.random.choice(LAST_NAMES))
+                 for i in xrange(count)]
+        usernames = generate_usernames(names, self.round_name,
+                                       self.taken_usernames)
+        users = [User(username=username,
+                      first_name=first_name,
+                      last_name=last_name,
+                      email='applicant%d@example.com' % (start + i),
+                      password=self.password_hash)
+                 for i, ((first_name, last_name), username)
+                 in enumerate(zip(names, usernames))]
+        bulk_insert(User, users)
+        user_pks = dict(User.objects.filter(username__in=usernames)
+                        .values_list('username', 'pk'))
+        applications = []
+        for user in users:
+            user.pk = user_pks[user.username]
+            application = Application(
+                user=user,
+                round_name=self.round_name,
+                cv=u'Experience of %s %s' % (user.first_name,
+                                             user.last_name),
+                experience_years=self.random.randint(0, 30),
+                confirmed=self.random.random() < .5,
+                send_confirmation_email=False)
+            application.prepare_save()
+            applications.append(application)
+        bulk_insert(Application, applications)
+
+    def pick_applications(self, count):
+        pks = list(Application.objects.values_list('pk', flat=True))
+        pks = self.random.sample(pks, min(count, len(pks)))
+        return list(Application.objects.filter(pk__in=pks)
+                    .select_related('user'))
+
+    def measure(self, scenario, count):
+        use_debug_cursor = getattr(connection, 'use_debug_cursor', None)
+        connection.use_debug_cursor = True
+        latencies = []
+        queries = []
+        try:
+            started = default_timer()
+            for i in xrange(count):
+                reset_queries()
+                request_started = default_timer()
+                scenario(i)
+                latencies.append(default_timer() - request_started)
+                queries.append(len(connection.queries))
+            total = default_timer() - started
+        finally:
+            reset_queries()
+            connection.use_debug_cursor = use_debug_cursor
+        return summarize(latencies, queries, total)
+
+    def applicant(self, i):
+        return self.sample[i % len(self.sample)]
+
+    def edit_get(self, i):
+        return EditApplication(rf.get('/'), _render=False)
+
+    def edit_post_new(self, i):
+        data = {'user-email': 'new%d@example.com' % i,
+                'user-first_name': self.random.choice(FIRST_NAMES),
+                'user-last_name': self.random.choice(LAST_NAMES),
+                'application-cv': u'Experience',
+                'application-experience_years': '3'}
+        return EditApplication(rf.post('/', data), _render=False)
+
+    def edit_post_existing(self, i):
+        application = self.applicant(i)
+        user = application.user
+        data = {'user-email': user.email,
+                'user-first_name': user.first_name,
+                'user-last_name': user.last_name,
+                'application-cv': u'Updated experience %d' % i,
+                'application-experience_years': str(
+                    application.experience_years)}
+        request = rf.post('/', data)
+        user.backend = settings.AUTHENTICATION_BACKENDS[0]
+        request.user = user
+        return EditApplication(request, _render=False)
+
+    def login_post(self, i):
+        data = {'username': self.applicant(i).user.username,
+                'password': PASSWORD}
+        return Login(rf.post('/', data), _render=False)
+
+    def confirm_get(self, i):
+        application = self.applicant(i)
+        return ConfirmApplication(
+            rf.get('/'),
+            application_id=str(application.pk),
+            confirmation_code=application.confirmation_code,
+            _render=False)
+
+    def list_get(self, i):
+        params = {'sort': ApplicationList.sort_fields[
+                i % len(ApplicationList.sort_fields)]}
+        request = rf.get('/', params)
+        request.user = self.secretary
+        return ApplicationList(request, round=self.round_name, _render=False)
@@ -1,6 +1,11 @@
 from django.db import models
-from candidates.models import ApplicationBase
+from candidates.models import ApplicationBase, AttachmentBase
 
 class Application(ApplicationBase):
     cv = models.TextField()
     experience_years = models.IntegerField()
+
+    search_fields = 'cv',
+
+class Attachment(AttachmentBase):
+    application = models.ForeignKey(Application, related_name='attachments')
@@ -6,4 +6,24 @@ urlpatterns = patterns(
     url(regex='^application/$',
         view='EditApplication',
         name='edit-application'),
+
+    url(regex=r'^confirm/(?P<application_id>\d+)-(?P<confirmation_code>\w+)/$',
+        view='ConfirmApplication',
+        name='confirm-application'),
+
+    url(regex=r'^confirmed/(?P<application_id>\d+)/$',
+        view='ApplicationConfirmationResult',
+        name='application-confirmation-result'),
+
+    url(regex=r'^applications/(?P<round>\w+)/$',
+        view='ApplicationList',
+        name='application-list'),
+
+    url(regex='^login/$',
+        view='Login',
+        name='login'),
+
+    url(regex='^login/(?P<username>[^/]+)/$',
+        view='Login',
+        name='applicant-login'),
 )
@@ -1,6 +1,8 @@
 from datetime import date, timedelta
 
-from candidates.views import MetaBase, EditApplicationBase
+from candidates.views import MetaBase, EditApplicationBase, \
+    ConfirmApplicationBase, ApplicationConfirmationResultBase, LoginBase, \
+    ApplicationListBase
 
 from candidates_test_app.models import Application
 from candidates_test_app.forms import ApplicationForm
@@ -31,3 +33,15 @@ class EditApplication(EditApplicationBase):
         about the candidate.
         """
         return ApplicationForm(data, instance=instance, prefix=prefix)
+
+class ConfirmApplication(ConfirmApplicationBase):
+    meta = ApplicationMeta
+
+class ApplicationConfirmationResult(ApplicationConfirmationResultBase):
+    meta = ApplicationMeta
+
+class Login(LoginBase):
+    meta = ApplicationMeta
+
+class ApplicationList(ApplicationListBase):
+    meta = ApplicationMeta
@@ -19,3 +19,6 @@ INSTALLED_APPS = ('django.contrib.auth',
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
 
 APPLICATION_EMAIL_SENDER = 'robot@localhost'
+
+CANDIDATES_INSTRUMENTATION = False
+CANDIDATES_INSTRUMENTATION_SINK = 'candidates.instrumentation.LoggingSink'